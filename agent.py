@@ -0,0 +1,113 @@
+# agent.py
+# python agent.py  (INGEST_URL, INGEST_TOKEN and optionally MONITORING_HOST set in the environment or .env)
+import gzip
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+
+class IngestAgent:
+    """Bufor próbek w lokalnym SQLite, wysyłany partiami (JSON + gzip) do POST /api/ingest serwera"""
+
+    def __init__(self, url, token, host, buffer_path, batch_size=60, interval=30, timeout=10, max_batches=1000):
+        self.url, self.token, self.host = url, token, host
+        self.batch_size, self.interval, self.timeout, self.max_batches = batch_size, interval, timeout, max_batches
+        self.sent_batches = self.sent_samples = self.duplicates = self.failures = 0
+        self.last_error = None
+        self.last_push = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._session = requests.Session()
+        self.conn = sqlite3.connect(buffer_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS samples (id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL)')
+        # a sealed batch keeps its seq and bytes until the server acknowledges it, so a retry is byte-identical
+        self.conn.execute('CREATE TABLE IF NOT EXISTS batches (seq INTEGER PRIMARY KEY AUTOINCREMENT, body BLOB NOT NULL, samples INTEGER)')
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'agent'").fetchone()
+        if row: self.agent = row[0]
+        else:
+            self.agent = uuid.uuid4().hex
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('agent', ?)", (self.agent,))
+
+    def start(self):
+        threading.Thread(target=self._run, name='ingest-agent', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def add(self, sample):
+        with self._lock: self.conn.execute('INSERT INTO samples (body) VALUES (?)', (json.dumps(sample),))
+
+    def seal(self):
+        """Zamyka oczekujące próbki w partie po batch_size; najstarsze partie ponad max_batches przepadają"""
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    rows = self.conn.execute('SELECT id, body FROM samples ORDER BY id LIMIT ?', (self.batch_size,)).fetchall()
+                    if not rows: break
+                    cursor = self.conn.execute('INSERT INTO batches (body, samples) VALUES (?, ?)', (b'', len(rows)))
+                    body = f'{{"host": {json.dumps(self.host)}, "agent": "{self.agent}", "seq": {cursor.lastrowid}, ' \
+                           f'"samples": [{", ".join(body for _, body in rows)}]}}'
+                    self.conn.execute('UPDATE batches SET body = ? WHERE seq = ?', (gzip.compress(body.encode(), 6), cursor.lastrowid))
+                    self.conn.execute('DELETE FROM samples WHERE id <= ?', (rows[-1][0],))
+                self.conn.execute('DELETE FROM batches WHERE seq <= (SELECT MAX(seq) FROM batches) - ?', (self.max_batches,))
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def push(self):
+        """Wysyła najstarszą partię; True, jeśli serwer ją przyjął (także jako duplikat)"""
+        with self._lock: row = self.conn.execute('SELECT seq, body, samples FROM batches ORDER BY seq LIMIT 1').fetchone()
+        if row is None: return False
+        seq, body, samples = row
+        response = self._session.post(self.url, data=body, timeout=self.timeout, headers={
+            'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Authorization': f'Bearer {self.token}'})
+        if response.status_code != 200: raise RuntimeError(f'ingest returned HTTP {response.status_code}: {response.text[:200]}')
+        if response.json().get('duplicate'): self.duplicates += 1
+        with self._lock: self.conn.execute('DELETE FROM batches WHERE seq = ?', (seq,))
+        self.sent_batches += 1
+        self.sent_samples += samples
+        self.last_push = time.time()
+        return True
+
+    def _run(self):
+        delay = self.interval
+        while not self._stop.wait(delay):
+            try:
+                self.seal()
+                while self.push(): pass
+                delay, self.last_error = self.interval, None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                # the batches stay in the buffer; back off while the server is unreachable
+                delay = min(delay * 2, 600)
+                print(f"Error pushing metrics to {self.url}: {e}")
+
+    def status(self):
+        with self._lock:
+            pending_samples = self.conn.execute('SELECT COUNT(*) FROM samples').fetchone()[0]
+            pending_batches = self.conn.execute('SELECT COUNT(*) FROM batches').fetchone()[0]
+        return {'url': self.url, 'host': self.host, 'agent': self.agent, 'pending_samples': pending_samples, 'pending_batches': pending_batches,
+                'sent_batches': self.sent_batches, 'sent_samples': self.sent_samples, 'duplicates': self.duplicates,
+                'failures': self.failures, 'last_error': self.last_error, 'last_push': self.last_push}
+
+
+if __name__ == '__main__':
+    # the same collectors the dashboard uses, without the web app and its assets; INGEST_URL makes record_metrics feed the agent
+    import os
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not os.getenv('INGEST_URL'): raise SystemExit("INGEST_URL must be set in environment variables")
+    import monitoring
+    monitoring.elect()
+    print(f"Pushing metrics of {monitoring.extended_monitor.host} to {os.getenv('INGEST_URL')}")
+    threading.Event().wait()
@@ -2,15 +2,23 @@
 
 from flask import Flask, render_template, jsonify, Response, request, redirect, url_for, session, flash
 from werkzeug.security import check_password_hash
-import psutil
-import subprocess
 import os
 import time
-from datetime import datetime, timedelta
+import math
 from dotenv import load_dotenv
 from functools import wraps
-import sqlite3
-import socket
+import json
+import hmac
+import re
+import zlib
+from sampler import diff
+from camera import CameraCapture, STREAM_PROFILES
+from recorder import Recorder
+from assets import AssetPipeline
+from instrumentation import REGISTRY, instrument_app
+from shared import SHARED_DIR, CommandSpool, LeaderLock, SharedSlot
+from export import EXPORT_FORMATS, EXPORT_TABLES, export, parse_time
+from monitoring import collector_lock, elect, extended_monitor, ingest_agent, metrics_sampler
 
 load_dotenv()
 
@@ -19,112 +27,18 @@ app.secret_key = os.getenv('SECRET_KEY')
 if not app.secret_key:
     raise ValueError("SECRET_KEY must be set in environment variables")
 
+instrument_app(app)
+assets = AssetPipeline(app, os.getenv('ASSET_CACHE_DIR', os.path.join(app.root_path, '.asset-cache')))
+assets.build()
+
 CAM_USERS = {
     os.getenv('CAM_ADMIN_USER', 'admin'): os.getenv('CAM_ADMIN_PASS'),
     os.getenv('CAM_MARCIN_USER', 'marcin'): os.getenv('CAM_MARCIN_PASS')
 }
 
-class ExtendedMonitoring:
-    def __init__(self):
-        self.db_path = '/var/www/gingerity.space/monitoring.db'
-        self.init_database()
-    
-    def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS system_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, cpu_percent REAL,
-                ram_percent REAL, disk_percent REAL, temperature REAL, network_sent_mb REAL,
-                network_recv_mb REAL, active_connections INTEGER, load_avg_1m REAL, ping_ms REAL)''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS top_processes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, process_name TEXT,
-                cpu_percent REAL, memory_mb REAL, pid INTEGER)''')
-        conn.commit()
-        conn.close()
-    
-    def get_network_metrics(self):
-        try:
-            net_io = psutil.net_io_counters()
-            return {
-                'bytes_sent_mb': round(net_io.bytes_sent / 1024 / 1024, 2),
-                'bytes_recv_mb': round(net_io.bytes_recv / 1024 / 1024, 2),
-                'active_connections': len(psutil.net_connections())}
-        except Exception:
-            return {'bytes_sent_mb': 0, 'bytes_recv_mb': 0, 'active_connections': 0}
-    
-    def get_top_processes(self, limit=5):
-        try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info']):
-                try:
-                    proc_info = proc.info
-                    if proc_info['cpu_percent'] is not None and proc_info['memory_info'] is not None:
-                        processes.append({
-                            'pid': proc_info['pid'], 'name': proc_info['name'], 'cpu_percent': proc_info['cpu_percent'],
-                            'memory_mb': round(proc_info['memory_info'].rss / 1024 / 1024, 1)})
-                except (psutil.NoSuchProcess, psutil.AccessDenied): continue
-            return {
-                'top_cpu': sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)[:limit],
-                'top_ram': sorted(processes, key=lambda x: x['memory_mb'], reverse=True)[:limit]}
-        except Exception:
-            return {'top_cpu': [], 'top_ram': []}
-    
-    def ping_test(self, target='8.8.8.8'):
-        try:
-            result = subprocess.run(['ping', '-c', '1', '-W', '3', target], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if 'time=' in line:
-                        return {'success': True, 'ping_ms': round(float(line.split('time=')[1].split()[0]), 1)}
-            return {'success': False, 'ping_ms': None}
-        except Exception:
-            return {'success': False, 'ping_ms': None}
-
-    def save_metrics(self, metrics):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('INSERT INTO system_metrics (cpu_percent, ram_percent, disk_percent, temperature, network_sent_mb, network_recv_mb, active_connections, load_avg_1m, ping_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',(
-                metrics.get('cpu_percent', 0), metrics.get('memory', {}).get('percent', 0), metrics.get('disk', {}).get('percent', 0), metrics.get('temperature', 0),
-                metrics.get('network', {}).get('bytes_sent_mb', 0), metrics.get('network', {}).get('bytes_recv_mb', 0),
-                metrics.get('network', {}).get('active_connections', 0), metrics.get('load_avg', 0), metrics.get('ping', {}).get('ping_ms', 0)))
-            for proc in metrics.get('processes', {}).get('top_cpu', []):
-                cursor.execute('INSERT INTO top_processes (process_name, cpu_percent, memory_mb, pid) VALUES (?, ?, ?, ?)',
-                               (proc['name'], proc['cpu_percent'], proc['memory_mb'], proc['pid']))
-            conn.commit()
-            week_ago = datetime.now() - timedelta(days=7)
-            cursor.execute('DELETE FROM system_metrics WHERE timestamp < ?', (week_ago,))
-            cursor.execute('DELETE FROM top_processes WHERE timestamp < ?', (week_ago,))
-            conn.commit()
-            conn.close()
-        except Exception as e: print(f"Error saving metrics: {e}")
-
-    def get_history(self, hours=24):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            time_ago = datetime.now() - timedelta(hours=hours)
-            cursor.execute('''
-                SELECT
-                    strftime('%Y-%m-%d %H:00:00', timestamp) as hour,
-                    AVG(cpu_percent),
-                    AVG(ram_percent),
-                    AVG(temperature)
-                FROM system_metrics
-                WHERE timestamp > ?
-                GROUP BY hour
-                ORDER BY hour ASC
-            ''', (time_ago,))
-            rows = cursor.fetchall()
-            conn.close()
-            return [{'timestamp': r[0], 'cpu_percent': round(r[1] or 0, 1), 'ram_percent': round(r[2] or 0, 1), 'temperature': round(r[3] or 0, 1)} for r in rows]
-        except Exception as e:
-            print(f"Error getting history: {e}")
-            return []
-
-extended_monitor = ExtendedMonitoring()
+INGEST_TOKEN = os.getenv('INGEST_TOKEN')
+INGEST_MAX_BYTES = int(os.getenv('INGEST_MAX_BYTES', str(8 * 1024 * 1024)))
+HOST_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]{0,63}')
 
 def verify_camera_password(username, password):
     if username not in CAM_USERS: return False
@@ -139,46 +53,148 @@ def camera_login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_system_info():
-    info = {
-        'cpu_percent': psutil.cpu_percent(interval=None), 'memory': psutil.virtual_memory()._asdict(),
-        'disk': psutil.disk_usage('/')._asdict(), 'temperature': 0.0, 'uptime': "N/A",
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-    try: info['temperature'] = float(subprocess.check_output(['vcgencmd', 'measure_temp']).decode('utf-8').split('=')[1].split('\'')[0])
-    except Exception: pass
-    try:
-        uptime_seconds = time.time() - psutil.boot_time()
-        info['uptime'] = f"{int(uptime_seconds // 3600)}h {int((uptime_seconds % 3600) // 60)}m"
-    except Exception: pass
-    info['network'] = extended_monitor.get_network_metrics()
-    info['processes'] = extended_monitor.get_top_processes()
-    info['ping'] = extended_monitor.ping_test()
-    info['load_avg'] = round(os.getloadavg()[0], 2) if hasattr(os, 'getloadavg') else 0
-    extended_monitor.save_metrics(info)
-    return info
+# under gunicorn every worker imports the app; elect() lets one of them collect, the others follow its snapshots
+elect(on_start=assets.warm)
 
 def kill_camera_processes():
     try:
-        subprocess.run(['pkill', '-f', 'libcamera-vid'], timeout=5)
+        camera_capture.stop()
     except Exception as e:
         print(f"Error killing camera process: {e}")
 
 @app.route('/')
-def dashboard(): return render_template('dashboard.html')
+def dashboard(): return assets.page('dashboard.html')
 
 @app.route('/api/system')
-def api_system(): return jsonify(get_system_info())
+def api_system():
+    snapshot = metrics_sampler.latest(timeout=15)
+    if snapshot is None: return jsonify({'error': 'No metrics collected yet'}), 503
+    return Response(snapshot.json, mimetype='application/json')
+
+def metrics_event(snapshot, since=None):
+    if since is not None and snapshot.seq == since + 1 and snapshot.delta_json is not None: event, data = 'delta', snapshot.delta_json
+    else:
+        previous = metrics_sampler.find(since) if since is not None else None
+        if previous: event, data = 'delta', json.dumps(diff(previous.data, snapshot.data))
+        else: event, data = 'full', snapshot.json
+    return f'id: {snapshot.seq}\nevent: {event}\ndata: {data}\n\n'
+
+def generate_metrics_events(last_event_id=None):
+    yield 'retry: 10000\n\n'
+    seq = last_event_id
+    snapshot = metrics_sampler.latest(timeout=15)
+    if seq is not None and snapshot and seq > snapshot.seq: seq = None
+    while True:
+        if snapshot is None or (seq is not None and snapshot.seq <= seq): yield ': keepalive\n\n'
+        else:
+            yield metrics_event(snapshot, seq)
+            seq = snapshot.seq
+        snapshot = metrics_sampler.wait_for_next(seq or 0, timeout=15)
+
+@app.route('/api/system/stream')
+def api_system_stream():
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(generate_metrics_events(last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/system/collectors')
+def api_system_collectors():
+    return jsonify({**metrics_sampler.collector_stats(), 'history_cache': extended_monitor.history_cache.stats(),
+                    'collecting': collector_lock.held, 'pid': os.getpid(), 'agent': ingest_agent.status() if ingest_agent else None})
+
+@app.route('/api/system/hosts')
+def api_system_hosts():
+    return jsonify({'hosts': extended_monitor.hosts()})
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    if not INGEST_TOKEN: return jsonify({'error': 'Ingest is disabled, set INGEST_TOKEN'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {INGEST_TOKEN}'.encode()):
+        return jsonify({'error': 'Invalid ingest token'}), 401
+    if (request.content_length or 0) > INGEST_MAX_BYTES: return jsonify({'error': 'Batch too large'}), 413
+    try:
+        body = request.get_data()
+        if request.content_encoding == 'gzip':
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            body = inflater.decompress(body, INGEST_MAX_BYTES)
+            if inflater.unconsumed_tail: return jsonify({'error': 'Batch too large'}), 413
+        batch = json.loads(body)
+        host, agent, seq, samples = batch['host'], str(batch['agent']), int(batch['seq']), batch['samples']
+        if not isinstance(host, str) or not HOST_NAME.fullmatch(host): raise ValueError(f'invalid host name {host!r}')
+        if host == extended_monitor.host: raise ValueError(f'{host} is the name of this server')
+        stored = extended_monitor.ingest(host, agent, seq, samples)
+    except (ValueError, TypeError, KeyError, OverflowError, zlib.error) as e:
+        REGISTRY.counter('ingest_batches_total', 'Batches received from remote agents', result='rejected').inc()
+        return jsonify({'error': f'Invalid batch: {e}'}), 400
+    REGISTRY.counter('ingest_batches_total', 'Batches received from remote agents', result='stored' if stored else 'duplicate').inc()
+    return jsonify({'success': True, 'duplicate': not stored, 'samples': len(samples)})
 
 @app.route('/api/system/history')
 def api_system_history():
-    hours = request.args.get('hours', 24, type=int)
-    return jsonify(extended_monitor.get_history(hours))
+    hours = request.args.get('hours', 24, type=float)
+    if not math.isfinite(hours) or hours <= 0: return jsonify({'error': 'hours must be a positive finite number'}), 400
+    # the oldest tier keeps nothing beyond its retention; longer ranges would only walk empty chunks
+    hours = min(hours, extended_monitor.ROLLUPS[-1][2] * 24)
+    host = request.args.get('host') or extended_monitor.host
+    columnar = request.args.get('format') == 'columnar'
+    points = min(max(request.args.get('points', 500, type=int), 1), extended_monitor.COLUMNAR_MAX_BUCKETS)
+    minmax = request.args.get('agg') == 'minmax'
+    key = extended_monitor.history_key(hours, extended_monitor.COLUMNAR_MAX_BUCKETS if columnar else None, host)
+    etag = '-'.join(map(str, key + ((points, int(minmax)) if columnar else ())))
+    # ranges served from memory change every second with the newest sample
+    if columnar and host == extended_monitor.host and hours * 3600 <= extended_monitor.ring.span: etag += f'-{hours}-{extended_monitor.ring.newest}'
+    # the key changes whenever the answer could, so a matching client is answered without touching the rollups
+    if request.if_none_match.contains(etag): response = Response(status=304)
+    elif columnar: response = jsonify(extended_monitor.get_history_columnar(hours, points, minmax, key, host))
+    else: response = jsonify(extended_monitor.get_history(hours, key, host))
+    response.set_etag(etag)
+    response.last_modified = key[3] or None
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/system/processes')
+def api_system_processes():
+    hours = request.args.get('hours', 24, type=float)
+    if not math.isfinite(hours): return jsonify({'error': 'hours must be a finite number'}), 400
+    by = request.args.get('by', 'cpu')
+    if by not in ('cpu', 'memory'): return jsonify({'error': 'Unknown order, use cpu or memory'}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    return jsonify({'hours': hours, 'by': by, 'processes': extended_monitor.top_processes(hours, by, limit, request.args.get('host'))})
+
+@app.route('/api/system/processes/history')
+def api_system_process_history():
+    name = request.args.get('name')
+    if not name: return jsonify({'error': 'name is required'}), 400
+    hours = request.args.get('hours', 24, type=float)
+    if not math.isfinite(hours): return jsonify({'error': 'hours must be a finite number'}), 400
+    points = min(max(request.args.get('points', 200, type=int), 1), extended_monitor.COLUMNAR_MAX_BUCKETS)
+    history = extended_monitor.process_history(name, hours, points, request.args.get('host'))
+    if history is None: return jsonify({'error': f'Unknown process: {name}'}), 404
+    return jsonify(history)
+
+@app.route('/api/system/export')
+def api_system_export():
+    table = request.args.get('table', 'system_metrics')
+    fmt = request.args.get('format', 'ndjson')
+    if table not in EXPORT_TABLES: return jsonify({'error': f'Unknown table, use one of: {", ".join(EXPORT_TABLES)}'}), 400
+    if fmt not in EXPORT_FORMATS: return jsonify({'error': f'Unknown format, use one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    try:
+        end = parse_time(request.args['end']) if request.args.get('end') else int(time.time()) + 1
+        start = parse_time(request.args['start']) if request.args.get('start') else end - 86400
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time range: {e}'}), 400
+    gzipped = request.args.get('gzip') == '1'
+    filename = f'{table}-{start}-{end}.{fmt}' + ('.gz' if gzipped else '')
+    # rows are read and sent in chunks, so memory use does not depend on the size of the range
+    return Response(export(extended_monitor.db_path, table, start, end, fmt, gzipped, request.args.get('host')),
+                    mimetype='application/gzip' if gzipped else EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}', 'X-Accel-Buffering': 'no'})
 
 @app.route('/progress')
 def progress():
-    return render_template('progress.html')
+    return assets.page('progress.html')
 
-def generate_mjpeg_stream():
+def camera_command():
     width = os.getenv('STREAM_WIDTH', '1920')
     height = os.getenv('STREAM_HEIGHT', '1080')
     fps = os.getenv('STREAM_FPS', '20')
@@ -188,29 +204,130 @@ def generate_mjpeg_stream():
     
     if roi:
         cmd.extend(['--roi', roi])
+    return cmd
+
+camera_capture = CameraCapture(camera_command(), keep_warm=int(os.getenv('CAMERA_KEEP_WARM', '60')),
+                               owner_lock=LeaderLock(os.getenv('CAMERA_LOCK', os.path.join(SHARED_DIR, 'gingerity-camera.lock'))),
+                               shared=SharedSlot(os.getenv('CAMERA_SHM', os.path.join(SHARED_DIR, 'gingerity-camera')), 4 * 1024 * 1024),
+                               change_gate={'threshold': float(os.getenv('CAMERA_GATE_THRESHOLD', '0.5')),
+                                            'keepalive': float(os.getenv('CAMERA_GATE_KEEPALIVE', '5'))}
+                               if os.getenv('CAMERA_CHANGE_GATE', '0') == '1' else None)
+PHOTOS_DIR = os.path.join(app.static_folder, 'photos')
+RECORDINGS_DIR = os.getenv('RECORDINGS_DIR', os.path.join(app.root_path, 'recordings'))
+camera_recorder = None
+# recorder and timed capture run in the collecting worker; other workers hand their requests over through this spool
+camera_jobs = CommandSpool(os.getenv('CAMERA_JOBS_DIR', os.path.join(SHARED_DIR, 'gingerity-camera-jobs')))
 
-    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def generate_mjpeg_stream(profile='full', gated=False):
+    frames_sent = REGISTRY.counter('camera_stream_frames_total', 'Frames sent to stream viewers', profile=profile)
+    bytes_sent = REGISTRY.counter('camera_stream_bytes_total', 'JPEG bytes sent to stream viewers', profile=profile)
+    frames = camera_capture.frames(profile, gated=gated)
     try:
-        byte_stream = b''
-        while True:
-            byte_stream += process.stdout.read(4096)
-            a = byte_stream.find(b'\xff\xd8')
-            b = byte_stream.find(b'\xff\xd9')
-            if a != -1 and b != -1:
-                jpg = byte_stream[a:b+2]
-                byte_stream = byte_stream[b+2:]
-                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpg + b'\r\n')
+        for jpg in frames:
+            frames_sent.inc()
+            bytes_sent.inc(len(jpg))
+            # with Content-Length the browser shows a part at once instead of waiting for the next boundary,
+            # which matters when the gate holds the next frame back for seconds
+            yield b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(jpg) + jpg + b'\r\n'
     except GeneratorExit:
-        print("Client disconnected, stopping stream process.")
+        print("Client disconnected, leaving shared stream.")
     finally:
-        print("Terminating libcamera-vid process...")
-        process.terminate()
-        process.wait()
+        frames.close()
+
+def camera_viewers():
+    viewers = {'full': camera_capture.viewers - sum(s.viewers for s in list(camera_capture.scalers.values()))}
+    # gated and ungated viewers of one profile are reported together
+    for (profile, _), scaler in list(camera_capture.scalers.items()): viewers[profile] = viewers.get(profile, 0) + scaler.viewers
+    return [({'profile': profile}, count) for profile, count in viewers.items()]
+
+REGISTRY.callback('camera_stream_viewers', 'Attached camera viewers per profile, recorder and timed capture included', camera_viewers)
+REGISTRY.callback('camera_capture_running', 'Whether the shared capture process is running', lambda: [({}, int(camera_capture.running))])
+REGISTRY.callback('camera_motion_active', 'Whether the change gate currently sees motion',
+                  lambda: [({}, int(camera_capture.motion_status().get('active', False)))])
+REGISTRY.callback('collector_overruns_total', 'Collector runs that exceeded their timeout',
+                  lambda: [({'collector': name}, probe.overruns) for name, probe in metrics_sampler.probes.items()], kind='counter')
+REGISTRY.callback('history_cache_hits_total', 'History chunk cache hits', lambda: [({}, extended_monitor.history_cache.hits)], kind='counter')
+REGISTRY.callback('history_cache_misses_total', 'History chunk cache misses', lambda: [({}, extended_monitor.history_cache.misses)], kind='counter')
+
+@app.route('/metrics')
+def prometheus_metrics(): return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/cam/stream')
 @camera_login_required
-def camera_stream(): return Response(generate_mjpeg_stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+def camera_stream():
+    profile = request.args.get('profile', 'full')
+    if profile not in STREAM_PROFILES: return jsonify({'error': f'Unknown profile, use one of: {", ".join(STREAM_PROFILES)}'}), 400
+    return Response(generate_mjpeg_stream(profile, request.args.get('gate') == '1'), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/cam/motion')
+@camera_login_required
+def camera_motion():
+    return jsonify(camera_capture.motion_status())
     
+@app.route('/cam/snapshot.jpg')
+@camera_login_required
+def camera_snapshot():
+    etag, frame = camera_capture.snapshot()
+    if frame is None: return jsonify({'error': 'No frame available yet'}), 503
+    response = Response(frame, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def camera_job(command):
+    """Wykonuje polecenie nagrywania lub zdjęć seryjnych w tym procesie; zwraca [odpowiedź, kod HTTP]"""
+    global camera_recorder
+    action = command['action']
+    if action == 'capture_status':
+        job = camera_capture.timed_capture
+        return [job.status() if job else {}, 200]
+    if action == 'capture_start':
+        os.makedirs(PHOTOS_DIR, exist_ok=True)
+        return [{'success': True, **camera_capture.start_timed_capture(PHOTOS_DIR, command['interval'], command['count']).status()}, 200]
+    if action == 'record_status': return [camera_recorder.status() if camera_recorder else {}, 200]
+    if action == 'record_stop':
+        if camera_recorder: camera_recorder.stop()
+        return [{'success': True}, 200]
+    if action == 'record_start':
+        if camera_recorder and camera_recorder.running: return [{'error': 'Recording already running'}, 409]
+        camera_recorder = Recorder(camera_capture, RECORDINGS_DIR, command['mode'], command['segment_seconds'], command['interval'],
+                                   quota_bytes=int(os.getenv('RECORDINGS_QUOTA_MB', '2048')) * 1024 * 1024,
+                                   max_disk_percent=float(os.getenv('RECORDINGS_MAX_DISK_PERCENT', '90'))).start()
+        return [{'success': True, **camera_recorder.status()}, 200]
+    return [{'error': f'Unknown camera job: {action}'}, 400]
+
+def run_camera_job(action, **params):
+    # under gunicorn every worker would otherwise keep its own recorder; only the collecting worker runs them
+    if collector_lock.held: body, status = camera_job({'action': action, **params})
+    else:
+        result = camera_jobs.submit({'action': action, **params})
+        if result is None: return jsonify({'error': 'The worker running camera jobs did not answer, try again'}), 503
+        body, status = result
+    return jsonify(body), status
+
+camera_jobs.serve(camera_job, active=lambda: collector_lock.held)
+
+@app.route('/cam/capture', methods=['GET', 'POST'])
+@camera_login_required
+def camera_timed_capture():
+    if request.method == 'GET': return run_camera_job('capture_status')
+    interval = request.values.get('interval', 0, type=float)
+    count = request.values.get('count', 1, type=int)
+    if not interval >= 0 or not 1 <= count <= 1000: return jsonify({'error': 'interval >= 0 and 1 <= count <= 1000 required'}), 400
+    return run_camera_job('capture_start', interval=interval, count=count)
+
+@app.route('/cam/record', methods=['GET', 'POST', 'DELETE'])
+@camera_login_required
+def camera_record():
+    if request.method == 'GET': return run_camera_job('record_status')
+    if request.method == 'DELETE': return run_camera_job('record_stop')
+    mode = request.values.get('mode', 'segments')
+    segment_seconds = request.values.get('segment_seconds', 300, type=int)
+    interval = request.values.get('interval', 60, type=float)
+    if mode not in ('segments', 'timelapse') or segment_seconds < 10 or not interval > 0:
+        return jsonify({'error': 'mode segments|timelapse, segment_seconds >= 10 and interval > 0 required'}), 400
+    return run_camera_job('record_start', mode=mode, segment_seconds=segment_seconds, interval=interval)
+
 @app.route('/cam/stop_stream', methods=['GET', 'POST'])
 @camera_login_required
 def stop_stream():
@@ -231,7 +348,7 @@ def camera_login():
 
 @app.route('/cam')
 @camera_login_required
-def camera(): return render_template('camera.html')
+def camera(): return assets.page('camera.html')
 
 @app.route('/cam/logout')
 def camera_logout():
@@ -0,0 +1,161 @@
+# assets.py
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import namedtuple
+
+from flask import Response, abort, render_template, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TEXT_TYPES = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+IMAGE_TYPES = ('.jpg', '.jpeg', '.png')
+IMAGE_WIDTHS = (320, 640, 1280)
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASHED_NAME = re.compile(r'^(.+)\.([0-9a-f]{10})(\.[^./]+)$')
+
+Asset = namedtuple('Asset', ['path', 'digest', 'stat', 'body', 'encodings'])
+
+
+def compress(data):
+    """Warianty kodowania {'br': ..., 'gzip': ...}, tylko te mniejsze od oryginału"""
+    # brotli first: on equal client preference best_match keeps the earlier, smaller one
+    variants = {'br': brotli.compress(data, quality=11)} if brotli else {}
+    variants['gzip'] = gzip.compress(data, 9, mtime=0)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def hashed_name(filename, digest):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest}{ext}'
+
+
+def encoded_response(body, encodings, etag, mimetype, cache_control):
+    """Wybiera wariant wg Accept-Encoding i odpowiada 304, jeśli klient ma aktualną wersję"""
+    encoding = request.accept_encodings.best_match(list(encodings)) if encodings else None
+    if encoding in encodings: body, etag = encodings[encoding], f'{etag}-{encoding}'
+    else: encoding = None
+    response = Response(body, mimetype=mimetype)
+    if encoding: response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+class AssetPipeline:
+    """Statyczne pliki z hashem w nazwie, wstępnie skompresowane, z wariantami rozmiaru i WebP"""
+
+    def __init__(self, app, cache_dir, widths=IMAGE_WIDTHS):
+        self.app = app
+        self.static_folder = app.static_folder
+        self.cache_dir = cache_dir
+        self.widths = widths
+        self.assets = {}
+        self.pages = {}
+        self._lock = threading.Lock()
+        app.url_defaults(self.hash_url)
+        app.view_functions['static'] = self.serve
+
+    def asset(self, filename):
+        """Wpis manifestu; przeliczany tylko, gdy plik zmienił rozmiar lub mtime"""
+        path = safe_join(self.static_folder, filename)
+        try: st = os.stat(path)
+        except (OSError, TypeError): return None
+        stat = (st.st_size, st.st_mtime_ns)
+        entry = self.assets.get(filename)
+        if entry and entry.stat == stat: return entry
+        with open(path, 'rb') as f: data = f.read()
+        # text assets are small and kept in memory together with their compressed variants
+        text = filename.lower().endswith(TEXT_TYPES)
+        entry = Asset(path, hashlib.sha256(data).hexdigest()[:10], stat, data if text else None, compress(data) if text else {})
+        self.assets[filename] = entry
+        return entry
+
+    def hash_url(self, endpoint, values):
+        if endpoint != 'static' or 'filename' not in values: return
+        entry = self.asset(values['filename'])
+        if entry: values['filename'] = hashed_name(values['filename'], entry.digest)
+
+    def build(self):
+        """Hashuje i kompresuje wszystkie pliki od razu przy starcie"""
+        for root, _, files in os.walk(self.static_folder):
+            for name in files: self.asset(os.path.relpath(os.path.join(root, name), self.static_folder))
+
+    def warm(self):
+        """Generuje w tle warianty obrazów, żeby pierwsze żądanie nie czekało na Pillow"""
+        def run():
+            for filename, entry in list(self.assets.items()):
+                if not filename.lower().endswith(IMAGE_TYPES): continue
+                for width in (*self.widths, None):
+                    for webp in (True, False):
+                        if width or webp:
+                            try: self.variant(filename, entry, width, webp)
+                            except Exception as e: print(f"Error creating variant of {filename}: {e}")
+        threading.Thread(target=run, name='asset-variants', daemon=True).start()
+
+    def variant(self, filename, entry, width, webp):
+        """Ścieżka przeskalowanej lub WebP wersji obrazu, tworzonej raz i trzymanej na dysku"""
+        stem, ext = os.path.splitext(filename.replace(os.sep, '_'))
+        ext = '.webp' if webp else ext
+        path = os.path.join(self.cache_dir, f'{stem}.{entry.digest}.{width or "full"}{ext}')
+        if os.path.exists(path): return path
+        from PIL import Image
+        with self._lock:
+            if os.path.exists(path): return path
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with Image.open(entry.path) as image:
+                if width:
+                    image.draft('RGB', (width, width))
+                    image.thumbnail((width, image.height))
+                fmt = 'WEBP' if webp else image.format
+                if fmt == 'JPEG' and image.mode not in ('RGB', 'L'): image = image.convert('RGB')
+                # method 4 is the speed/size sweet spot on the Pi, 6 takes several times longer
+                options = {'quality': 80, 'method': 4} if webp else {'quality': 85, 'optimize': True}
+                # workers may render the same variant at once; each writes its own temp file
+                tmp = f'{path}.{os.getpid()}.tmp'
+                image.save(tmp, fmt, **options)
+            os.replace(tmp, path)
+        return path
+
+    def serve(self, filename):
+        match = HASHED_NAME.match(filename)
+        logical = match.group(1) + match.group(3) if match else filename
+        entry = self.asset(logical)
+        if entry is None: abort(404)
+        # an old hash still gets the current file, just without the long cache
+        cache_control = IMMUTABLE if match and match.group(2) == entry.digest else 'no-cache'
+        mimetype = mimetypes.guess_type(logical)[0] or 'application/octet-stream'
+        if entry.body is not None: return encoded_response(entry.body, entry.encodings, entry.digest, mimetype, cache_control)
+        path, vary = entry.path, None
+        if logical.lower().endswith(IMAGE_TYPES):
+            width = request.args.get('w', type=int)
+            width = next((w for w in self.widths if width and w >= width), None)
+            webp = 'image/webp' in request.headers.get('Accept', '')
+            if width or webp:
+                try:
+                    path = self.variant(logical, entry, width, webp)
+                    if webp: mimetype = 'image/webp'
+                except Exception as e:
+                    print(f"Error creating variant of {logical}: {e}")
+            vary = 'Accept'
+        response = send_file(path, mimetype=mimetype, etag=f'{entry.digest}-{os.path.basename(path)}', conditional=True)
+        response.headers['Cache-Control'] = cache_control
+        if vary: response.headers['Vary'] = vary
+        return response
+
+    def page(self, template):
+        """Szablon bez danych per żądanie: renderowany i kompresowany raz, potem 304"""
+        page = self.pages.get(template)
+        if page is None or self.app.debug:
+            body = render_template(template).encode('utf-8')
+            page = self.pages[template] = (body, compress(body), hashlib.sha256(body).hexdigest()[:16])
+        body, encodings, etag = page
+        return encoded_response(body, encodings, etag, 'text/html', 'no-cache')
@@ -0,0 +1,60 @@
+# benchmarks/bench_gate.py
+"""Ile klatek i bajtów oszczędza ChangeGate i ile kosztuje sygnatura klatki.
+
+Użycie: python benchmarks/bench_gate.py [nagranie.mjpeg] [--fps 20] [--threshold 0.5] [--keepalive 5]
+Bez nagrania generuje scenę 1920x1080: długie odcinki bez ruchu (tylko szum sensora)
+przeplatane odcinkami z przesuwającym się obiektem. Czas jest symulowany według --fps.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from camera import ChangeGate, JpegSplitter
+
+
+def synthetic_scene(seconds=60, fps=20, width=1920, height=1080, motion=((20, 25), (45, 48))):
+    from PIL import Image, ImageChops, ImageDraw
+    base = Image.effect_noise((width // 8, height // 8), 64).convert('RGB').resize((width, height))
+    noise = [Image.effect_noise((width, height), 3).convert('RGB') for _ in range(4)]
+    frames = []
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        # faint per-frame sensor noise, so static frames are never byte-identical
+        image = ImageChops.add(base, noise[i % len(noise)], offset=-128)
+        for start, end in motion:
+            if start <= t < end:
+                x = int((t - start) / (end - start) * (width - 200))
+                ImageDraw.Draw(image).rectangle((x, height // 3, x + 200, height // 3 + 200), fill=(240, 240, 240))
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=85)
+        frames.append(out.getvalue())
+    return frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('recording', nargs='?')
+    parser.add_argument('--fps', type=float, default=20)
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--keepalive', type=float, default=5.0)
+    args = parser.parse_args()
+    if args.recording:
+        with open(args.recording, 'rb') as f: frames = JpegSplitter().feed(f.read())
+        print(f"{len(frames)} frames from {args.recording}")
+    else:
+        started = time.perf_counter()
+        frames = synthetic_scene(args.seconds, args.fps)
+        print(f"{len(frames)} synthetic frames ({time.perf_counter() - started:.1f} s to generate), motion at 20-25 s and 45-48 s")
+    gate = ChangeGate(threshold=args.threshold, keepalive=args.keepalive)
+    for i, frame in enumerate(frames): gate.offer(frame, i / args.fps)
+    status = gate.status()
+    print(f"signature:  {status['signature_ms']:.2f} ms/frame ({1000 / args.fps:.0f} ms budget at {args.fps:g} fps)")
+    print(f"frames:     {status['frames_in']} in, {status['frames_out']} out")
+    print(f"bytes:      {status['bytes_in'] / 1e6:.1f} MB in, {status['bytes_out'] / 1e6:.1f} MB out, saved {status['saved_percent']}%")
+    for event in status['events']:
+        end = f"{event['end'] - event['start']:.1f} s" if event['end'] else 'open'
+        print(f"motion event: {event['frames']} changed frames, peak {event['peak']}, lasted {end}")
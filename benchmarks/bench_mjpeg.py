@@ -0,0 +1,76 @@
+# benchmarks/bench_mjpeg.py
+"""Porównanie starego parsera MJPEG z JpegSplitter na nagranym strumieniu.
+
+Użycie: python benchmarks/bench_mjpeg.py [nagranie.mjpeg] [--chunk 65536]
+Bez nagrania generuje strumień 1920x1080 przez Pillow. Mierzy też koszt skalowania profili streamu.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from camera import JpegSplitter, STREAM_PROFILES, scale_jpeg
+
+
+def synthetic_stream(frames=60, width=1920, height=1080):
+    from PIL import Image
+    base = Image.effect_noise((width // 8, height // 8), 64).convert('RGB').resize((width, height))
+    out = io.BytesIO()
+    for i in range(frames):
+        base.rotate(i % 2 * 180).save(out, 'JPEG', quality=85)
+    return out.getvalue()
+
+
+def legacy_parser(data, chunk_size):
+    copied = frames = 0
+    byte_stream = b''
+    for off in range(0, len(data), chunk_size):
+        byte_stream += data[off:off + chunk_size]
+        copied += len(byte_stream)
+        a = byte_stream.find(b'\xff\xd8')
+        b = byte_stream.find(b'\xff\xd9')
+        if a != -1 and b != -1:
+            copied += (b + 2 - a) + (len(byte_stream) - b - 2)
+            byte_stream = byte_stream[b+2:]
+            frames += 1
+    return frames, copied
+
+
+def splitter_parser(data, chunk_size):
+    splitter = JpegSplitter()
+    view = memoryview(data)
+    for off in range(0, len(data), chunk_size):
+        splitter.feed(view[off:off + chunk_size])
+    return splitter.frames, splitter.bytes_copied
+
+
+def run(name, parser, data, chunk_size):
+    start = time.perf_counter()
+    frames, copied = parser(data, chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"{name:10s} chunk={chunk_size:6d} frames={frames:4d} {frames / elapsed:9.1f} frames/s "
+          f"{copied / max(frames, 1) / 1024:9.1f} KiB copied/frame")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('recording', nargs='?')
+    parser.add_argument('--chunk', type=int, default=65536)
+    args = parser.parse_args()
+    if args.recording:
+        with open(args.recording, 'rb') as f: data = f.read()
+    else:
+        data = synthetic_stream()
+    print(f"stream: {len(data) / 1024 / 1024:.1f} MiB")
+    run('legacy', legacy_parser, data, 4096)
+    run('splitter', splitter_parser, data, 4096)
+    run('splitter', splitter_parser, data, args.chunk)
+    frames = JpegSplitter().feed(data)[:20]
+    for name, profile in STREAM_PROFILES.items():
+        if profile is None: continue
+        start = time.perf_counter()
+        scaled = [scale_jpeg(frame, *profile[:3]) for frame in frames]
+        elapsed = (time.perf_counter() - start) / len(frames)
+        print(f"scale {name:9s} {elapsed * 1000:7.1f} ms/frame {sum(map(len, scaled)) / len(scaled) / 1024:7.1f} KiB/frame")
@@ -0,0 +1,57 @@
+# benchmarks/bench_processes.py
+"""Koszt jednego pomiaru top procesów: process_iter + sorted kontra ProcessTracker.
+
+Użycie: python benchmarks/bench_processes.py [--spawn 1000] [--rounds 10]
+--spawn uruchamia dodatkowe procesy `sleep`, żeby mierzyć na hoście z 1000+ procesami.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processes import ProcessTracker
+
+
+def legacy_top(limit=5):
+    processes = []
+    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info']):
+        try:
+            proc_info = proc.info
+            if proc_info['cpu_percent'] is not None and proc_info['memory_info'] is not None:
+                processes.append({
+                    'pid': proc_info['pid'], 'name': proc_info['name'], 'cpu_percent': proc_info['cpu_percent'],
+                    'memory_mb': round(proc_info['memory_info'].rss / 1024 / 1024, 1)})
+        except (psutil.NoSuchProcess, psutil.AccessDenied): continue
+    return {
+        'top_cpu': sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)[:limit],
+        'top_ram': sorted(processes, key=lambda x: x['memory_mb'], reverse=True)[:limit]}
+
+
+def run(name, sample, rounds):
+    sample()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        sample()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:8s} median {timings[len(timings) // 2] * 1000:7.1f} ms  max {timings[-1] * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spawn', type=int, default=0)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+    children = [subprocess.Popen(['sleep', '600']) for _ in range(args.spawn)]
+    try:
+        print(f"processes: {len(psutil.pids())}")
+        run('legacy', legacy_top, args.rounds)
+        run('tracker', ProcessTracker().top, args.rounds)
+    finally:
+        for child in children: child.kill()
+        for child in children: child.wait()
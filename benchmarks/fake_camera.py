@@ -0,0 +1,35 @@
+# benchmarks/fake_camera.py
+"""Udaje libcamera-vid: odtwarza nagrany strumień MJPEG na stdout w zadanym tempie.
+
+Użycie: python benchmarks/fake_camera.py [nagranie.mjpeg] [--fps 20]
+Bez nagrania wysyła syntetyczne klatki 1920x1080. Można go podać jako cmd do CameraCapture.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from camera import JpegSplitter
+from bench_mjpeg import synthetic_stream
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('recording', nargs='?')
+    parser.add_argument('--fps', type=float, default=20)
+    args = parser.parse_args()
+    if args.recording:
+        with open(args.recording, 'rb') as f: data = f.read()
+    else:
+        data = synthetic_stream(frames=10)
+    frames = JpegSplitter().feed(data)
+    out = sys.stdout.buffer
+    try:
+        while True:
+            for frame in frames:
+                started = time.monotonic()
+                out.write(frame)
+                out.flush()
+                time.sleep(max(0, 1 / args.fps - (time.monotonic() - started)))
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
@@ -0,0 +1,91 @@
+# benchmarks/load_api.py
+"""Przepustowość /api/system pod gunicornem przy rosnącej liczbie workerów.
+
+Użycie: python benchmarks/load_api.py [--workers 1 2 4] [--clients 8] [--duration 10]
+Każdy przebieg startuje gunicorn -c gunicorn.conf.py z osobną bazą i osobnymi plikami blokad,
+klienci to osobne procesy (keep-alive), żeby GIL klienta nie ograniczał wyniku.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def client(port, path, duration, results):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200: errors += 1
+            latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    results.put((latencies, errors))
+
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/system')
+            if conn.getresponse().status == 200: return True
+        except (OSError, http.client.HTTPException): pass
+        time.sleep(0.5)
+    return False
+
+
+def run(workers, clients, duration, port, path):
+    tmp = tempfile.mkdtemp(prefix='gingerity-load-')
+    env = {
+        **os.environ, 'SECRET_KEY': 'load-test', 'MONITORING_DB': os.path.join(tmp, 'monitoring.db'),
+        'COLLECTOR_LOCK': os.path.join(tmp, 'collector.lock'), 'SNAPSHOT_SHM': os.path.join(tmp, 'snapshot'),
+        'CAMERA_LOCK': os.path.join(tmp, 'camera.lock'), 'CAMERA_SHM': os.path.join(tmp, 'camera'), 'CAMERA_JOBS_DIR': os.path.join(tmp, 'jobs'),
+        'ASSET_CACHE_DIR': os.path.join(tmp, 'assets'), 'WEB_CONCURRENCY': str(workers), 'GUNICORN_BIND': f'127.0.0.1:{port}'}
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(port): raise RuntimeError('gunicorn did not answer /api/system')
+        # let every worker receive its first snapshot from the collecting one
+        time.sleep(3)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(port, path, duration, results)) for _ in range(clients)]
+        for p in procs: p.start()
+        latencies, errors = [], 0
+        for _ in procs:
+            lat, err = results.get()
+            latencies += lat
+            errors += err
+        for p in procs: p.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+    print(f"workers={workers:<3} requests/s={len(latencies) / duration:9.1f}  p50={pick(0.5):6.2f} ms  "
+          f"p95={pick(0.95):6.2f} ms  errors={errors}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--path', default='/api/system')
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.duration:.0f} s per run, GET {args.path}")
+    for workers in args.workers: run(workers, args.clients, args.duration, args.port, args.path)
@@ -0,0 +1,115 @@
+# benchmarks/load_ingest.py
+"""Dziesiątki agentów wysyłających partie do POST /api/ingest lokalnego serwera gunicorn.
+
+Użycie: python benchmarks/load_ingest.py [--agents 40] [--procs 4] [--samples 30] [--duration 20] [--retry 0.1] [--workers 2]
+Każdy agent ma własny host i numerację partii; ułamek --retry partii jest wysyłany drugi raz (zgubione potwierdzenie).
+Na koniec liczba wierszy każdego hosta w bazie jest porównywana z liczbą przyjętych partii, żeby sprawdzić idempotencję.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_api import ROOT, wait_ready
+
+TOKEN = 'load-test'
+
+
+def batch(host, seq, samples, start):
+    rows = [{'timestamp': start + i * 10, 'cpu_percent': random.uniform(0, 100), 'ram_percent': random.uniform(20, 80),
+             'disk_percent': 41.5, 'temperature': random.uniform(40, 70), 'load_avg_1m': random.uniform(0, 4), 'ping_ms': random.uniform(5, 30),
+             'network_sent_bytes_s': random.uniform(0, 1e5), 'network_recv_bytes_s': random.uniform(0, 1e6), 'active_connections': 12,
+             'processes': [['python3', 12.5, 80.1, 1234], ['gunicorn', 3.1, 45.0, 999]]} for i in range(samples)]
+    return gzip.compress(json.dumps({'host': host, 'agent': 'load', 'seq': seq, 'samples': rows}).encode())
+
+
+def agent(port, host, samples, duration, retry, out):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Authorization': f'Bearer {TOKEN}'}
+    latencies, stored, duplicates, errors = [], 0, 0, 0
+    seq, start = 1, int(time.time()) - 86400
+    body = batch(host, seq, samples, start)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request('POST', '/api/ingest', body, headers)
+            response = conn.getresponse()
+            result = json.loads(response.read() or b'{}')
+        except (OSError, http.client.HTTPException, ValueError):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+        if response.status != 200:
+            errors += 1
+            continue
+        if result.get('duplicate'): duplicates += 1
+        else: stored += 1
+        # an agent that lost the acknowledgement sends the very same batch again
+        if random.random() < retry: continue
+        seq, start = seq + 1, start + samples * 10
+        body = batch(host, seq, samples, start)
+    out.append((host, latencies, stored, duplicates, errors))
+
+
+def client(port, hosts, samples, duration, retry, results):
+    out = []
+    threads = [threading.Thread(target=agent, args=(port, host, samples, duration, retry, out)) for host in hosts]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    results.put(out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--agents', type=int, default=40)
+    parser.add_argument('--procs', type=int, default=4)
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--retry', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=5056)
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix='gingerity-ingest-')
+    db = os.path.join(tmp, 'monitoring.db')
+    env = {
+        **os.environ, 'SECRET_KEY': 'load-test', 'INGEST_TOKEN': TOKEN, 'MONITORING_DB': db,
+        'COLLECTOR_LOCK': os.path.join(tmp, 'collector.lock'), 'SNAPSHOT_SHM': os.path.join(tmp, 'snapshot'),
+        'CAMERA_LOCK': os.path.join(tmp, 'camera.lock'), 'CAMERA_SHM': os.path.join(tmp, 'camera'), 'CAMERA_JOBS_DIR': os.path.join(tmp, 'jobs'),
+        'ASSET_CACHE_DIR': os.path.join(tmp, 'assets'), 'WEB_CONCURRENCY': str(args.workers), 'GUNICORN_BIND': f'127.0.0.1:{args.port}'}
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(args.port): raise RuntimeError('gunicorn did not answer /api/system')
+        hosts = [f'agent-{i:03d}' for i in range(args.agents)]
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(args.port, hosts[i::args.procs], args.samples, args.duration, args.retry, results))
+                 for i in range(args.procs)]
+        for p in procs: p.start()
+        agents = [item for _ in procs for item in results.get()]
+        for p in procs: p.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = sorted(lat for _, lats, *_ in agents for lat in lats)
+    stored, duplicates, errors = (sum(a[i] for a in agents) for i in (2, 3, 4))
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+    print(f"{os.cpu_count()} CPUs, {args.workers} workers, {args.agents} agents, {args.samples} samples per batch, {args.duration:.0f} s")
+    print(f"batches/s={len(latencies) / args.duration:.1f}  samples/s={stored * args.samples / args.duration:.0f}  "
+          f"p50={pick(0.5):.1f} ms  p95={pick(0.95):.1f} ms  stored={stored}  duplicates={duplicates}  errors={errors}")
+    conn = sqlite3.connect(db)
+    rows = dict(conn.execute('SELECT host, COUNT(*) FROM system_metrics GROUP BY host').fetchall())
+    wrong = [host for host, _, n, *_ in agents if rows.get(host, 0) != n * args.samples]
+    print(f"idempotency: {'every host has exactly stored x samples rows' if not wrong else f'row count mismatch for {wrong}'}")
@@ -0,0 +1,496 @@
+# camera.py
+import hashlib
+import io
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+from shared import RemoteStream
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+# name -> (max width, max height, JPEG quality, max fps); None means the capture as is
+STREAM_PROFILES = {
+    'full': None,
+    'preview': (640, 360, 70, 10),
+    'thumbnail': (320, 180, 60, 2)}
+
+
+def scale_jpeg(data, width, height, quality):
+    """Zmniejsz klatkę JPEG; draft() dekoduje od razu w 1/2-1/8 rozdzielczości"""
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.draft('RGB', (width, height))
+    image = image.convert('RGB')
+    image.thumbnail((width, height))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=quality)
+    return out.getvalue()
+
+
+class JpegSplitter:
+    """Przyrostowy podział strumienia MJPEG na klatki JPEG w czasie liniowym"""
+
+    def __init__(self, max_frame_size=8 * 1024 * 1024):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+        self.pos = 0
+        self.in_frame = False
+        self.in_scan = False
+        self.bytes_copied = 0
+        self.frames = 0
+
+    def feed(self, data):
+        """Dopisz fragment strumienia i zwróć listę kompletnych klatek"""
+        self.buffer += data
+        self.bytes_copied += len(data)
+        frames = []
+        while True:
+            frame = self._next_frame()
+            if frame is None: break
+            frames.append(frame)
+        if self.in_frame and len(self.buffer) > self.max_frame_size: self._resync()
+        return frames
+
+    def _next_frame(self):
+        buf = self.buffer
+        n = len(buf)
+        if not self.in_frame:
+            i = buf.find(SOI, self.pos)
+            if i == -1:
+                # keep a trailing 0xff in case the marker straddles two reads
+                keep = 1 if n and buf[-1] == 0xFF else 0
+                del buf[:n - keep]
+                self.pos = 0
+                return None
+            del buf[:i]
+            self.in_frame, self.in_scan, self.pos = True, False, 2
+            n = len(buf)
+        pos = self.pos
+        # walk marker segments up to SOS so EOI bytes inside APPn payloads
+        # (e.g. an EXIF thumbnail) are skipped instead of ending the frame
+        while not self.in_scan:
+            if pos + 2 > n: break
+            if buf[pos] != 0xFF:
+                # not a well-formed header, fall back to a plain EOI search
+                self.in_scan = True
+                break
+            marker = buf[pos + 1]
+            if marker == 0xFF: pos += 1
+            elif marker == 0xD9: return self._emit(pos + 2)
+            elif marker == 0xD8: return self._resync()
+            elif marker == 0x01 or 0xD0 <= marker <= 0xD7: pos += 2
+            else:
+                if pos + 4 > n: break
+                length = (buf[pos + 2] << 8) | buf[pos + 3]
+                if length < 2:
+                    self.in_scan = True
+                    break
+                pos += 2 + length
+                self.in_scan = marker == 0xDA
+        if self.in_scan:
+            # entropy-coded data stuffs 0xff with 0x00, so the first ff d9 is the real EOI
+            i = buf.find(EOI, pos)
+            if i != -1: return self._emit(i + 2)
+            pos = max(pos, n - 1)
+        self.pos = pos
+        return None
+
+    def _emit(self, end):
+        frame = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        self.bytes_copied += end
+        self.frames += 1
+        self.in_frame, self.in_scan, self.pos = False, False, 0
+        return frame
+
+    def _resync(self):
+        i = self.buffer.find(SOI, 1)
+        del self.buffer[:i if i != -1 else max(len(self.buffer) - 1, 0)]
+        self.in_frame, self.in_scan, self.pos = False, False, 0
+        return None if i == -1 else self._next_frame()
+
+
+class FrameBroadcaster:
+    """Bufor pierścieniowy ostatnich klatek JPEG dla wielu odbiorców"""
+
+    def __init__(self, size=4):
+        self.size = size
+        self.frames = [None] * size
+        self.seq = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, frame):
+        with self._cond:
+            self.seq += 1
+            self.frames[self.seq % self.size] = frame
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond: return self.seq, self.frames[self.seq % self.size]
+
+    def read(self, cursor, timeout=None, latest=False):
+        """Zwraca (seq, klatka) nowszą niż cursor albo (cursor, None) po zamknięciu/timeoucie"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > cursor or self.closed, timeout) or self.seq <= cursor:
+                return cursor, None
+            # a subscriber that fell behind skips straight to the newest frame
+            seq = self.seq if latest or self.seq - cursor >= self.size else cursor + 1
+            return seq, self.frames[seq % self.size]
+
+
+class ScaledStream:
+    """Pomniejszona kopia strumienia liczona raz dla wszystkich widzów danego profilu"""
+
+    def __init__(self, source, width, height, quality, max_fps, buffer_size=4):
+        self.source = source
+        self.width, self.height, self.quality = width, height, quality
+        self.min_interval = 1 / max_fps if max_fps else 0
+        self.broadcaster = FrameBroadcaster(buffer_size)
+        self.viewers = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='camera-scaler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        cursor, last = self.source.seq, 0.0
+        try:
+            while not self._stop.is_set():
+                # only the newest frame is scaled; frames that arrive while scaling are dropped
+                cursor, frame = self.source.read(cursor, timeout=1, latest=True)
+                if frame is None:
+                    if self.source.closed: return
+                    continue
+                wait = last + self.min_interval - time.monotonic()
+                if wait > 0:
+                    self._stop.wait(wait)
+                    continue
+                last = time.monotonic()
+                self.broadcaster.publish(scale_jpeg(frame, self.width, self.height, self.quality))
+        except Exception as e:
+            print(f"Error scaling camera stream: {e}")
+        finally:
+            self.broadcaster.close()
+
+
+def frame_signature(data, size=(64, 36)):
+    """Mała szara miniatura klatki; draft() pozwala libjpeg dekodować od razu w 1/8 rozdzielczości"""
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.draft('L', (size[0] * 4, size[1] * 4))
+    return image.convert('L').resize(size, Image.BILINEAR)
+
+
+def signature_distance(a, b, pixel_threshold=24):
+    """Procent pikseli sygnatury, których jasność zmieniła się o więcej niż pixel_threshold"""
+    from PIL import ImageChops, ImageStat
+    # a share of changed area, not a mean: a small object moving across a static scene must still count
+    changed = ImageChops.difference(a, b).point(lambda v: 255 if v > pixel_threshold else 0)
+    return ImageStat.Stat(changed).mean[0] / 2.55
+
+
+class ChangeGate:
+    """Przepuszcza klatki tylko przy zmianie sceny, a bez zmian co keepalive sekund; sygnatura liczona raz na klatkę"""
+
+    def __init__(self, source=None, threshold=0.5, keepalive=5.0, hold=2.0, buffer_size=4, events=None):
+        self.source = source
+        self.threshold, self.keepalive, self.hold = threshold, keepalive, hold
+        self.broadcaster = FrameBroadcaster(buffer_size)
+        self.events = events if events is not None else deque(maxlen=100)
+        self.event = None
+        self.reference = None
+        self.last_sent = self.last_change = float('-inf')
+        self.frames_in = self.frames_out = self.bytes_in = self.bytes_out = 0
+        self.signature_seconds = 0.0
+        # offer() runs on the monotonic clock, the timeline is reported in wall-clock time
+        self.epoch = time.time() - time.monotonic()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name='camera-change-gate', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def offer(self, frame, now):
+        """Czy wysłać klatkę; aktualizuje oś zdarzeń ruchu i liczniki"""
+        started = time.perf_counter()
+        signature = frame_signature(frame)
+        # compared with the last frame sent, so slow drifts (daylight) still get through eventually
+        score = signature_distance(signature, self.reference) if self.reference is not None else None
+        self.signature_seconds += time.perf_counter() - started
+        self.frames_in += 1
+        self.bytes_in += len(frame)
+        changed = score is not None and score > self.threshold
+        if changed:
+            self.last_change = now
+            if self.event is None:
+                self.event = {'start': round(self.epoch + now, 2), 'end': None, 'peak': 0.0, 'frames': 0}
+                self.events.append(self.event)
+            self.event['peak'] = max(self.event['peak'], round(score, 1))
+            self.event['frames'] += 1
+        elif self.event is not None and now - self.last_change > self.hold:
+            self.event['end'] = round(self.epoch + self.last_change, 2)
+            self.event = None
+        if score is not None and not changed and now - self.last_sent < self.keepalive: return False
+        self.reference, self.last_sent = signature, now
+        self.frames_out += 1
+        self.bytes_out += len(frame)
+        return True
+
+    def _run(self):
+        cursor = self.source.seq
+        try:
+            while not self._stop.is_set():
+                # the newest frame only: if signatures fall behind the camera, frames are skipped, never queued
+                cursor, frame = self.source.read(cursor, timeout=1, latest=True)
+                if frame is None:
+                    if self.source.closed: return
+                    continue
+                if self.offer(frame, time.monotonic()): self.broadcaster.publish(frame)
+        except Exception as e:
+            print(f"Error in camera change gate: {e}")
+        finally:
+            self.broadcaster.close()
+            if self.event is not None:
+                self.event['end'] = round(self.epoch + self.last_change, 2)
+                self.event = None
+
+    def status(self):
+        return {
+            'active': self.event is not None, 'events': list(self.events), 'threshold': self.threshold, 'keepalive_s': self.keepalive,
+            'frames_in': self.frames_in, 'frames_out': self.frames_out, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+            'saved_percent': round(100 * (1 - self.bytes_out / self.bytes_in), 1) if self.bytes_in else None,
+            'signature_ms': round(self.signature_seconds * 1000 / self.frames_in, 2) if self.frames_in else None}
+
+
+class TimedCapture:
+    """Zapisuje co interval sekund klatkę do katalogu, działając jak zwykły widz"""
+
+    def __init__(self, capture, directory, interval, count):
+        self.capture, self.directory, self.interval, self.count = capture, directory, interval, count
+        self.saved = []
+        self.done = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='camera-timed-capture', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        frames = self.capture.frames()
+        next_at = 0.0
+        try:
+            for frame in frames:
+                if self._stop.is_set() or len(self.saved) >= self.count: break
+                if time.monotonic() < next_at: continue
+                next_at = time.monotonic() + self.interval
+                self.saved.append(save_frame(frame, self.directory))
+        except Exception as e:
+            print(f"Error in timed capture: {e}")
+        finally:
+            frames.close()
+            self.done = True
+
+    def status(self):
+        return {'interval': self.interval, 'count': self.count, 'saved': list(self.saved), 'done': self.done}
+
+
+def save_frame(frame, directory):
+    """Zapisz klatkę jako photo_RRRRMMDD_GGMMSS.jpg i zwróć nazwę pliku"""
+    base = time.strftime('photo_%Y%m%d_%H%M%S')
+    name, n = f'{base}.jpg', 1
+    while os.path.exists(os.path.join(directory, name)):
+        name, n = f'{base}_{n}.jpg', n + 1
+    with open(os.path.join(directory, name), 'wb') as f: f.write(frame)
+    return name
+
+
+class CameraCapture:
+    """Jeden proces libcamera-vid współdzielony przez wszystkich widzów"""
+
+    def __init__(self, cmd, buffer_size=4, read_size=64 * 1024, profiles=STREAM_PROFILES, keep_warm=0, owner_lock=None, shared=None,
+                 change_gate=None):
+        self.cmd = cmd
+        # ChangeGate options; when set, every capture session runs one gate that gated viewers share
+        self.change_gate = change_gate
+        self.gate = None
+        self.motion_events = deque(maxlen=100)
+        # with several workers only the lock holder runs libcamera-vid and shares frames through the slot
+        self.owner_lock, self.shared = owner_lock, shared
+        self.buffer_size = buffer_size
+        self.read_size = read_size
+        self.profiles = profiles
+        self.keep_warm = keep_warm
+        self.warm_until = 0.0
+        self.session = 0
+        self._snapshot_etag = (None, None, None)
+        self.process = None
+        self.broadcaster = None
+        self.scalers = {}
+        self.timed_capture = None
+        self.viewers = 0
+        self._lock = threading.Lock()
+
+    def frames(self, profile='full', timeout=10, gated=False):
+        """Generator klatek JPEG dla jednego widza w wybranym profilu; gated pomija klatki bez zmian w scenie"""
+        if profile not in self.profiles: raise ValueError(f"Unknown stream profile: {profile}")
+        key = (profile, gated and self.change_gate is not None)
+        broadcaster, scaler = self._attach(key)
+        cursor = broadcaster.seq
+        # a gated viewer starts with the current picture instead of waiting for the next change
+        if key[1] and broadcaster.seq: cursor -= 1
+        # gated streams may stay silent for up to keepalive seconds
+        if key[1]: timeout += self.change_gate.get('keepalive', 5.0)
+        try:
+            while True:
+                cursor, frame = broadcaster.read(cursor, timeout)
+                if frame is None: return
+                yield frame
+        finally:
+            self._detach(key, scaler)
+
+    def _attach(self, key):
+        profile, gated = key
+        with self._lock:
+            self.viewers += 1
+            if self.process is None: self._start()
+            source = self.gate.broadcaster if gated else self.broadcaster
+            if self.profiles[profile] is None: return source, None
+            scaler = self.scalers.get(key)
+            if scaler is None:
+                scaler = self.scalers[key] = ScaledStream(source, *self.profiles[profile], self.buffer_size).start()
+            scaler.viewers += 1
+            return scaler.broadcaster, scaler
+
+    def _detach(self, key, scaler):
+        with self._lock:
+            if scaler is not None:
+                scaler.viewers -= 1
+                if scaler.viewers <= 0:
+                    scaler.stop()
+                    if self.scalers.get(key) is scaler: del self.scalers[key]
+            self.viewers -= 1
+            if self.viewers <= 0:
+                self.viewers = 0
+                # with keep_warm the reaper stops the process once the warm period runs out
+                if self.keep_warm: self.warm_until = max(self.warm_until, time.monotonic() + self.keep_warm)
+                else: self._terminate()
+
+    def _start(self):
+        self.session = int(time.time() * 1000)
+        self.broadcaster = FrameBroadcaster(self.buffer_size)
+        if self.owner_lock is None or self.owner_lock.acquire():
+            print("Starting libcamera-vid process...")
+            self.process = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        else:
+            print("Camera is owned by another worker, relaying its frames...")
+            self.process = RemoteStream(self.shared)
+        if self.change_gate is not None: self.gate = ChangeGate(self.broadcaster, events=self.motion_events, **self.change_gate).start()
+        threading.Thread(target=self._read_frames, args=(self.process, self.broadcaster),
+                         name='camera-reader', daemon=True).start()
+        threading.Thread(target=self._reap, args=(self.process,), name='camera-reaper', daemon=True).start()
+
+    def _reap(self, process):
+        while True:
+            time.sleep(1)
+            with self._lock:
+                if self.process is not process: return
+                if self.viewers <= 0 and time.monotonic() >= self.warm_until and not self._remote_demand():
+                    self._terminate()
+                    return
+
+    def _terminate(self):
+        process, self.process = self.process, None
+        if self.broadcaster: self.broadcaster.close()
+        if self.gate: self.gate.stop()
+        for scaler in self.scalers.values(): scaler.stop()
+        self.scalers = {}
+        if process is None: return
+        print("Terminating libcamera-vid process...")
+        process.terminate()
+        try: process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        if self.owner_lock and not isinstance(process, RemoteStream): self.owner_lock.release()
+
+    def _remote_demand(self):
+        return self.shared is not None and self.owner_lock.held and self.shared.touched_within(3)
+
+    def _read_frames(self, process, broadcaster):
+        splitter = JpegSplitter()
+        chunk = memoryview(bytearray(self.read_size))
+        try:
+            while True:
+                n = process.stdout.readinto1(chunk)
+                if not n: break
+                share = self._remote_demand()
+                for frame in splitter.feed(chunk[:n]):
+                    broadcaster.publish(frame)
+                    if share: self.shared.write(broadcaster.seq, frame)
+        except Exception as e:
+            print(f"Error reading camera stream: {e}")
+        finally:
+            broadcaster.close()
+            with self._lock:
+                if self.process is process: self._terminate()
+
+    def snapshot(self, timeout=10):
+        """(etag, klatka) najnowszej klatki; uruchamia przechwytywanie i trzyma je ciepłe przez keep_warm s"""
+        with self._lock:
+            if self.process is None: self._start()
+            self.warm_until = max(self.warm_until, time.monotonic() + self.keep_warm)
+            broadcaster, session = self.broadcaster, self.session
+        if broadcaster.seq == 0: broadcaster.read(0, timeout)
+        seq, frame = broadcaster.latest()
+        if frame is None: return None, None
+        # a hash of the frame, not the local sequence number: every worker relays the same bytes, so they agree on the ETag
+        cached_session, cached_seq, etag = self._snapshot_etag
+        if (cached_session, cached_seq) != (session, seq):
+            etag = hashlib.blake2b(frame, digest_size=12).hexdigest()
+            self._snapshot_etag = (session, seq, etag)
+        return etag, frame
+
+    def motion_status(self):
+        """Oś zdarzeń ruchu i skuteczność bramki (ostatniej sesji, jeśli kamera stoi)"""
+        if self.change_gate is None: return {'enabled': False}
+        if self.gate is None: return {'enabled': True, 'running': False, 'events': list(self.motion_events)}
+        status = self.gate.status()
+        # the gate closes its open event when it stops; until then a stopped camera sees no motion either
+        return {'enabled': True, 'running': self.running, **status, 'active': status['active'] and self.running}
+
+    def start_timed_capture(self, directory, interval, count):
+        with self._lock:
+            if self.timed_capture and not self.timed_capture.done: self.timed_capture.stop()
+            self.timed_capture = TimedCapture(self, directory, interval, count)
+        return self.timed_capture.start()
+
+    def stop(self):
+        """Zatrzymaj przechwytywanie i rozłącz wszystkich widzów"""
+        with self._lock:
+            self._terminate()
+
+    @property
+    def running(self):
+        return self.process is not None
@@ -0,0 +1,113 @@
+# export.py
+# python export.py system_metrics --start 2025-06-01 --end 2025-06-02 --format csv --gzip -o june.csv.gz
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+EXPORT_TABLES = ('system_metrics', 'top_processes')
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def parse_time(value):
+    """Sekundy epoki albo data ISO 8601 (bez strefy: UTC)"""
+    try: return int(float(value))
+    except ValueError: pass
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None: moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def read_only(db_path):
+    # in WAL mode a reader never blocks the writer; mode=ro also guarantees the export cannot write
+    return sqlite3.connect(f'file:{quote(os.path.abspath(db_path))}?mode=ro', uri=True, check_same_thread=False)
+
+
+def export_rows(db_path, table, start, end, host=None, chunk=1000):
+    """Generator: najpierw lista kolumn, potem paczki po chunk wierszy w kolejności czasu"""
+    if table not in EXPORT_TABLES: raise ValueError(f"Unknown table: {table}")
+    conn = read_only(db_path)
+    try:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})') if row[1] != 'id']
+        select, joins = [f't.{column}' for column in columns], ''
+        if 'name_id' in columns:
+            # process names live once in process_names; the export shows the name, not its id
+            i = columns.index('name_id')
+            columns[i], select[i], joins = 'process_name', 'n.name', ' JOIN process_names n ON n.id = t.name_id'
+        query = f'SELECT {", ".join(select)} FROM {table} t{joins} WHERE t.timestamp >= ? AND t.timestamp < ?'
+        params = [start, end]
+        if host:
+            query += ' AND t.host = ?'
+            params.append(host)
+        # ordered by an indexed column, so SQLite walks the index instead of sorting the whole range in memory
+        cursor = conn.execute(query + ' ORDER BY t.timestamp', params)
+        yield columns
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows: return
+            yield rows
+    finally:
+        conn.close()
+
+
+def render(chunks, fmt='ndjson'):
+    """Paczki wierszy z export_rows jako tekst NDJSON lub CSV, jeden kawałek na paczkę"""
+    columns = next(chunks)
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell(): yield buffer.getvalue()
+    elif fmt == 'ndjson':
+        for rows in chunks: yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def encode(texts, gzip=False):
+    """Kawałki tekstu jako bajty, opcjonalnie jeden strumień gzip kompresowany w locie"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+    for text in texts:
+        data = text.encode()
+        if compressor: data = compressor.compress(data)
+        if data: yield data
+    if compressor: yield compressor.flush()
+
+
+def export(db_path, table, start, end, fmt='ndjson', gzip=False, host=None, chunk=1000):
+    return encode(render(export_rows(db_path, table, start, end, host, chunk), fmt), gzip)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export raw metrics from monitoring.db without stopping the app')
+    parser.add_argument('table', choices=EXPORT_TABLES)
+    parser.add_argument('--db', default=os.getenv('MONITORING_DB', '/var/www/gingerity.space/monitoring.db'))
+    parser.add_argument('--start', help='epoch seconds or ISO 8601, default: 24 hours ago')
+    parser.add_argument('--end', help='epoch seconds or ISO 8601, default: now')
+    parser.add_argument('--host', help='only rows of this host')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('-o', '--output', help='file to write, default: stdout')
+    args = parser.parse_args()
+    end = parse_time(args.end) if args.end else int(time.time()) + 1
+    start = parse_time(args.start) if args.start else end - 86400
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for data in export(args.db, args.table, start, end, args.format, args.gzip, args.host): out.write(data)
+    except BrokenPipeError:
+        # the reader (head, less) went away; nothing left to do
+        sys.stderr.close()
+    finally:
+        if args.output: out.close()
@@ -0,0 +1,13 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+# an MJPEG or SSE viewer holds one thread of a gthread worker instead of a whole sync worker
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+# every worker imports the app itself; a preloaded master would fork the collector lock into all of them
+preload_app = False
+timeout = 60
+graceful_timeout = 10
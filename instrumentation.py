@@ -0,0 +1,132 @@
+# instrumentation.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    if not labels: return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Stała liczba kubełków niezależnie od liczby pomiarów"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum, self.count = 0.0, 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            if i < len(self.counts): self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try: yield
+        finally: self.observe(time.perf_counter() - started)
+
+    def samples(self, name, labels):
+        with self._lock: counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            yield f'{name}_bucket{format_labels((*labels, ("le", format_value(float(bound)))))} {cumulative}'
+        yield f'{name}_bucket{format_labels((*labels, ("le", "+Inf")))} {count}'
+        yield f'{name}_sum{format_labels(labels)} {format_value(total)}'
+        yield f'{name}_count{format_labels(labels)} {count}'
+
+
+class Counter:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock: self.value += amount
+
+    def samples(self, name, labels):
+        yield f'{name}{format_labels(labels)} {format_value(self.value)}'
+
+
+class Registry:
+    """Metryki procesu w formacie tekstowym Prometheusa"""
+
+    def __init__(self):
+        self.families = {}      # name -> [type, help, {labels: metric}]
+        self.callbacks = {}     # name -> (type, help, fn returning [(labels dict, value)])
+        self._lock = threading.Lock()
+
+    def _metric(self, kind, factory, name, help, labels):
+        key = tuple(sorted(labels.items()))
+        family = self.families.get(name)
+        metric = family[2].get(key) if family else None
+        if metric is not None: return metric
+        with self._lock:
+            family = self.families.setdefault(name, [kind, help, {}])
+            return family[2].setdefault(key, factory())
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels):
+        return self._metric('histogram', lambda: Histogram(buckets), name, help, labels)
+
+    def counter(self, name, help, **labels):
+        return self._metric('counter', Counter, name, help, labels)
+
+    def callback(self, name, help, fn, kind='gauge'):
+        """Wartości liczone dopiero przy odczycie /metrics, np. liczba widzów"""
+        self.callbacks[name] = (kind, help, fn)
+
+    def render(self):
+        lines = []
+        for name, (kind, help, metrics) in sorted(self.families.items()):
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+            for labels, metric in sorted(metrics.items()): lines.extend(metric.samples(name, labels))
+        for name, (kind, help, fn) in sorted(self.callbacks.items()):
+            try: values = fn()
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+                continue
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+            for labels, value in values:
+                if value is not None: lines.append(f'{name}{format_labels(tuple(sorted(labels.items())))} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def instrument_app(app, registry=REGISTRY):
+    """Histogram czasu odpowiedzi dla każdej trasy (szablon reguły, nie surowy URL)"""
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        started = g.pop('request_started', None)
+        if started is None: return response
+        # streaming routes are measured to the first byte; their body runs after this hook
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        registry.histogram('http_request_duration_seconds', 'Time spent handling a request',
+                           route=route, method=request.method).observe(time.perf_counter() - started)
+        registry.counter('http_requests_total', 'Requests by route and status', route=route,
+                         method=request.method, status=response.status_code).inc()
+        return response
@@ -0,0 +1,682 @@
+# monitoring.py
+# the collectors, the metrics database and the election of the collecting process, without the Flask app;
+# app.py serves them, agent.py runs them headless and pushes the samples to a central dashboard
+import psutil
+import os
+import time
+import math
+from dotenv import load_dotenv
+import sqlite3
+import socket
+import json
+import threading
+import atexit
+import numpy as np
+from sampler import MetricsSampler
+from processes import ProcessTracker
+from prober import LatencyProber
+from sensors import SensorReader
+from cache import LRUCache
+from instrumentation import REGISTRY
+from network import NetworkRates, connection_states
+from shared import SHARED_DIR, LeaderLock, SharedSlot
+from ring import RingBuffer
+from agent import IngestAgent
+
+load_dotenv()
+
+class ExtendedMonitoring:
+    def __init__(self):
+        self.db_path = os.getenv('MONITORING_DB', '/var/www/gingerity.space/monitoring.db')
+        # samples collected here are stored under this name, remote agents under their own
+        self.host = os.getenv('MONITORING_HOST', socket.gethostname())
+        self.flush_interval = int(os.getenv('METRICS_FLUSH_INTERVAL', '60'))
+        self.batch_size = int(os.getenv('METRICS_BATCH_SIZE', '30'))
+        self.prune_interval = int(os.getenv('METRICS_PRUNE_INTERVAL', '3600'))
+        self.retention_days = int(os.getenv('METRICS_RAW_RETENTION_DAYS', '2'))
+        self.pending_metrics, self.pending_processes = [], []
+        self.last_flush = self.last_prune = time.monotonic()
+        self._writer = None
+        self._write_lock = threading.Lock()
+        self.history_cache = LRUCache(int(os.getenv('HISTORY_CACHE_SIZE', '256')), ttl=int(os.getenv('HISTORY_CACHE_TTL', '86400')))
+        self.process_tracker = ProcessTracker()
+        self.process_ids = {}
+        self.network_rates = NetworkRates()
+        self.ring = RingBuffer(self.ROLLUP_METRICS, int(os.getenv('RING_SECONDS', '3600')))
+        self._saved_totals = None
+        self.prober = LatencyProber([t.strip() for t in os.getenv('PING_TARGETS', '8.8.8.8').split(',') if t.strip()],
+                                    interval=int(os.getenv('PING_INTERVAL', '10')))
+        self.init_database()
+    
+    TABLES = {
+        'system_metrics': '''
+            CREATE TABLE IF NOT EXISTS system_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT, timestamp INTEGER NOT NULL DEFAULT (strftime('%s', 'now')), cpu_percent REAL,
+                ram_percent REAL, disk_percent REAL, temperature REAL, network_sent_mb REAL,
+                network_recv_mb REAL, active_connections INTEGER, load_avg_1m REAL, ping_ms REAL,
+                cpu_freq_mhz REAL, throttled INTEGER, zone_temps TEXT, network_sent_bytes_s REAL, network_recv_bytes_s REAL,
+                network_errors_s REAL)''',
+        'top_processes': '''
+            CREATE TABLE IF NOT EXISTS top_processes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT, timestamp INTEGER NOT NULL DEFAULT (strftime('%s', 'now')), name_id INTEGER NOT NULL,
+                cpu_percent REAL, memory_mb REAL, pid INTEGER)'''}
+    INDEXES = [
+        'CREATE INDEX IF NOT EXISTS idx_system_metrics_timestamp ON system_metrics (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_top_processes_timestamp ON top_processes (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_system_metrics_host_timestamp ON system_metrics (host, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_top_processes_host_timestamp ON top_processes (host, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_top_processes_name_timestamp ON top_processes (name_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_ingest_batches_received ON ingest_batches (received)']
+    # every process name is stored once; top_processes rows refer to it by id
+    PROCESS_NAMES_TABLE = 'CREATE TABLE IF NOT EXISTS process_names (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)'
+    # (table, bucket seconds, retention days) of the per-process rollup
+    PROCESS_ROLLUP = ('process_1h', 3600, 90)
+    # one row per batch accepted from a remote agent; the key makes a retried batch a no-op
+    INGEST_TABLE = '''
+        CREATE TABLE IF NOT EXISTS ingest_batches (
+            host TEXT NOT NULL, agent TEXT NOT NULL, seq INTEGER NOT NULL, received INTEGER NOT NULL, samples INTEGER,
+            PRIMARY KEY (host, agent, seq)) WITHOUT ROWID'''
+    # bumped when a batch lands behind the host's newest sample; cached history chunks of older revisions are never read again
+    REVISIONS_TABLE = 'CREATE TABLE IF NOT EXISTS host_revisions (host TEXT PRIMARY KEY, revision INTEGER NOT NULL) WITHOUT ROWID'
+    # how far ahead of the server clock an agent sample may be stamped
+    INGEST_MAX_SKEW = 300
+    # columns added after the first release, applied with ALTER TABLE on older databases
+    ADDED_COLUMNS = {'system_metrics': [('cpu_freq_mhz', 'REAL'), ('throttled', 'INTEGER'), ('zone_temps', 'TEXT'), ('network_sent_bytes_s', 'REAL'),
+                                        ('network_recv_bytes_s', 'REAL'), ('network_errors_s', 'REAL'), ('host', 'TEXT')],
+                     'top_processes': [('host', 'TEXT')]}
+    METRIC_COLUMNS = ('cpu_percent', 'ram_percent', 'disk_percent', 'temperature', 'network_sent_mb', 'network_recv_mb',
+                      'active_connections', 'load_avg_1m', 'ping_ms', 'cpu_freq_mhz', 'throttled', 'zone_temps',
+                      'network_sent_bytes_s', 'network_recv_bytes_s', 'network_errors_s')
+    ROLLUP_METRICS = ('cpu_percent', 'ram_percent', 'disk_percent', 'temperature', 'load_avg_1m', 'ping_ms', 'cpu_freq_mhz',
+                      'network_sent_bytes_s', 'network_recv_bytes_s', 'network_errors_s', 'active_connections')
+    # the list format predates the network rollups and keeps its original fields
+    HISTORY_METRICS = ROLLUP_METRICS[:7]
+    # (table, bucket seconds, retention days), finest first
+    ROLLUPS = (('metrics_1m', 60, 7), ('metrics_5m', 300, 30), ('metrics_1h', 3600, 90), ('metrics_1d', 86400, 1825))
+    HISTORY_CHUNK_BUCKETS = 60
+    COLUMNAR_MAX_BUCKETS = 5000
+
+    def init_database(self):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(self.PROCESS_NAMES_TABLE)
+            self.migrate_process_names(conn)
+            for table, ddl in self.TABLES.items():
+                conn.execute(ddl)
+                self.migrate_timestamps(conn, table)
+                self.add_missing_columns(conn, table)
+            conn.execute(self.INGEST_TABLE)
+            conn.execute(self.REVISIONS_TABLE)
+            for ddl in self.INDEXES: conn.execute(ddl)
+            for table, step, _ in self.ROLLUPS: self.create_rollup(conn, table, step)
+            self.create_process_rollup(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction: conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def migrate_timestamps(self, conn, table):
+        # older databases stored CURRENT_TIMESTAMP text (UTC); rebuild them with integer epoch seconds
+        columns = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if columns.get('timestamp', '').upper() == 'INTEGER': return
+        print(f"Migrating {table} to epoch timestamps...")
+        conn.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+        conn.execute(self.TABLES[table])
+        names = ', '.join(row[1] for row in conn.execute(f'PRAGMA table_info({table})') if row[1] in columns and row[1] != 'timestamp')
+        conn.execute(f"INSERT INTO {table} (timestamp, {names}) SELECT CAST(strftime('%s', timestamp) AS INTEGER), {names} FROM {table}_old WHERE timestamp IS NOT NULL")
+        conn.execute(f'DROP TABLE {table}_old')
+
+    def migrate_process_names(self, conn):
+        # older databases repeated the full process name in every row; move the names into process_names
+        columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(top_processes)')}
+        if 'process_name' not in columns: return
+        print("Migrating top_processes to process name ids...")
+        conn.execute('ALTER TABLE top_processes RENAME TO top_processes_old')
+        conn.execute(self.TABLES['top_processes'])
+        conn.execute('INSERT OR IGNORE INTO process_names (name) SELECT DISTINCT process_name FROM top_processes_old WHERE process_name IS NOT NULL')
+        host = 'COALESCE(o.host, ?)' if 'host' in columns else '?'
+        timestamp = 'o.timestamp' if columns['timestamp'].upper() == 'INTEGER' else "CAST(strftime('%s', o.timestamp) AS INTEGER)"
+        conn.execute(f'''
+            INSERT INTO top_processes (host, timestamp, name_id, cpu_percent, memory_mb, pid)
+            SELECT {host}, {timestamp}, n.id, o.cpu_percent, o.memory_mb, o.pid
+            FROM top_processes_old o JOIN process_names n ON n.name = o.process_name WHERE o.timestamp IS NOT NULL''', (self.host,))
+        conn.execute('DROP TABLE top_processes_old')
+
+    def add_missing_columns(self, conn, table):
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        for column, kind in self.ADDED_COLUMNS.get(table, []):
+            if column not in columns: conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+        # everything stored before remote agents existed was collected here; a table rebuilt by
+        # migrate_timestamps already has the column, but its copied rows have no host yet
+        if any(column == 'host' for column, _ in self.ADDED_COLUMNS.get(table, [])):
+            conn.execute(f'UPDATE {table} SET host = ? WHERE host IS NULL', (self.host,))
+
+    def create_rollup(self, conn, table, step):
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        ddl = f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                host TEXT NOT NULL, bucket INTEGER NOT NULL, metric TEXT NOT NULL, min_value REAL, max_value REAL, total REAL, samples INTEGER,
+                PRIMARY KEY (host, bucket, metric)) WITHOUT ROWID'''
+        if columns and 'host' not in columns:
+            # tiers from before remote agents: the host joins the primary key, so the table is rebuilt
+            print(f"Migrating {table} to per-host rollups...")
+            conn.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+            conn.execute(ddl)
+            conn.execute(f'INSERT INTO {table} SELECT ?, bucket, metric, min_value, max_value, total, samples FROM {table}_old', (self.host,))
+            conn.execute(f'DROP TABLE {table}_old')
+        conn.execute(ddl)
+        # the host leads the primary key; pruning by age and the per-metric check below need their own indexes
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_metric ON {table} (metric, bucket)')
+        # a new tier, or a metric new to an existing tier, starts from whatever raw samples are still kept
+        for metric in self.ROLLUP_METRICS:
+            if columns and conn.execute(f'SELECT 1 FROM {table} WHERE metric = ? LIMIT 1', (metric,)).fetchone(): continue
+            conn.execute(f'''
+                INSERT INTO {table} (host, bucket, metric, min_value, max_value, total, samples)
+                SELECT host, timestamp / {step} * {step}, ?, MIN({metric}), MAX({metric}), SUM({metric}), COUNT({metric})
+                FROM system_metrics WHERE {metric} IS NOT NULL GROUP BY 1, 2''', (metric,))
+
+    def create_process_rollup(self, conn):
+        table, step, _ = self.PROCESS_ROLLUP
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                host TEXT NOT NULL, bucket INTEGER NOT NULL, name_id INTEGER NOT NULL, cpu_total REAL, cpu_max REAL,
+                memory_total REAL, memory_max REAL, samples INTEGER, PRIMARY KEY (host, bucket, name_id)) WITHOUT ROWID''')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_name ON {table} (host, name_id, bucket)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket)')
+        if exists: return
+        conn.execute(f'''
+            INSERT INTO {table} (host, bucket, name_id, cpu_total, cpu_max, memory_total, memory_max, samples)
+            SELECT host, timestamp / {step} * {step}, name_id, SUM(cpu_percent), MAX(cpu_percent), SUM(memory_mb), MAX(memory_mb), COUNT(*)
+            FROM top_processes GROUP BY 1, 2, 3''')
+
+    def writer(self):
+        if self._writer is None:
+            self._writer = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._writer.execute('PRAGMA journal_mode=WAL')
+            self._writer.execute('PRAGMA synchronous=NORMAL')
+        return self._writer
+    
+    def get_network_metrics(self):
+        try:
+            return self.network_rates.sample()
+        except Exception:
+            return {'bytes_sent_mb': 0, 'bytes_recv_mb': 0}
+
+    def get_connections(self):
+        """Połączenia TCP wg stanu; active_connections nie liczy gniazd nasłuchujących"""
+        try:
+            states = connection_states()
+            if not states and not os.path.exists('/proc/net/tcp'): return {'active_connections': len(psutil.net_connections())}
+            return {'active_connections': sum(n for state, n in states.items() if state != 'listen'), 'connection_states': states}
+        except Exception:
+            return {'active_connections': 0}
+
+    def network_rates_since_save(self, network):
+        # average over the whole save interval, not the rate of the last 5 s network sample
+        totals, previous = network.get('totals'), self._saved_totals
+        self._saved_totals = totals
+        if not totals or not previous or totals['at'] <= previous['at']: return None, None, None
+        elapsed = totals['at'] - previous['at']
+        rate = lambda *fields: round(sum(totals[f] - previous[f] for f in fields) / elapsed, 2)
+        return rate('bytes_sent'), rate('bytes_recv'), rate('errin', 'errout')
+    
+    def get_top_processes(self, limit=5):
+        try:
+            return self.process_tracker.top(limit)
+        except Exception:
+            return {'top_cpu': [], 'top_ram': []}
+    
+    def ping_test(self, target=None):
+        try:
+            result = self.prober.summary(target)
+            if target is None and len(self.prober.targets) > 1: result['targets'] = self.prober.summaries()
+            return result
+        except Exception:
+            return {'success': False, 'ping_ms': None}
+
+    def save_metrics(self, metrics):
+        """Dopisuje pomiar do bufora zapisu; zwraca (wiersz, procesy) w postaci zapisywanej do bazy"""
+        timestamp = int(time.time())
+        sensors = metrics.get('sensors', {})
+        with self._write_lock:
+            sent_rate, recv_rate, error_rate = self.network_rates_since_save(metrics.get('network', {}))
+            row = (
+                timestamp, metrics.get('cpu_percent', 0), metrics.get('memory', {}).get('percent', 0), metrics.get('disk', {}).get('percent', 0), metrics.get('temperature', 0),
+                metrics.get('network', {}).get('bytes_sent_mb', 0), metrics.get('network', {}).get('bytes_recv_mb', 0),
+                metrics.get('network', {}).get('active_connections', 0), metrics.get('load_avg', 0), metrics.get('ping', {}).get('ping_ms', 0),
+                sensors.get('cpu_freq_mhz'), sensors.get('throttled'), json.dumps(sensors['zones']) if sensors.get('zones') else None,
+                sent_rate, recv_rate, error_rate)
+            processes = [(timestamp, proc['name'], proc['cpu_percent'], proc['memory_mb'], proc['pid'])
+                         for proc in metrics.get('processes', {}).get('top_cpu', [])]
+            self.pending_metrics.append(row)
+            self.pending_processes.extend(processes)
+            now = time.monotonic()
+            if len(self.pending_metrics) >= self.batch_size or now - self.last_flush >= self.flush_interval: self._flush()
+            if now - self.last_prune >= self.prune_interval: self._prune()
+        return row, processes
+
+    def flush(self):
+        with self._write_lock: self._flush()
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if not self.pending_metrics and not self.pending_processes: return
+        try:
+            with self.timed('flush'), self.writer() as conn: self._store(conn, self.host, self.pending_metrics, self.pending_processes)
+            self.pending_metrics, self.pending_processes = [], []
+        except Exception as e:
+            print(f"Error saving metrics: {e}")
+            # ids looked up inside the rolled back transaction may not exist
+            self.process_ids.clear()
+            # keep retrying later, but never let a broken database grow the buffer without bound
+            del self.pending_metrics[:-self.batch_size * 10], self.pending_processes[:-self.batch_size * 50]
+
+    def _store(self, conn, host, rows, processes):
+        conn.executemany(f'INSERT INTO system_metrics (host, timestamp, {", ".join(self.METRIC_COLUMNS)}) VALUES ({", ".join("?" * (len(self.METRIC_COLUMNS) + 2))})',
+                         [(host, *row) for row in rows])
+        self._rollup(conn, host, rows)
+        processes = [(timestamp, self.process_id(conn, name), cpu, memory, pid) for timestamp, name, cpu, memory, pid in processes]
+        conn.executemany('INSERT INTO top_processes (host, timestamp, name_id, cpu_percent, memory_mb, pid) VALUES (?, ?, ?, ?, ?, ?)',
+                         [(host, *proc) for proc in processes])
+        self._rollup_processes(conn, host, processes)
+
+    def process_id(self, conn, name):
+        name_id = self.process_ids.get(name)
+        if name_id is None:
+            conn.execute('INSERT OR IGNORE INTO process_names (name) VALUES (?)', (name,))
+            name_id = self.process_ids[name] = conn.execute('SELECT id FROM process_names WHERE name = ?', (name,)).fetchone()[0]
+        return name_id
+
+    def _rollup_processes(self, conn, host, processes):
+        table, step, _ = self.PROCESS_ROLLUP
+        buckets = {}
+        for timestamp, name_id, cpu, memory, _ in processes:
+            agg = buckets.get((timestamp // step * step, name_id))
+            if agg is None: buckets[(timestamp // step * step, name_id)] = [cpu, cpu, memory, memory, 1]
+            else: agg[0], agg[1], agg[2], agg[3], agg[4] = agg[0] + cpu, max(agg[1], cpu), agg[2] + memory, max(agg[3], memory), agg[4] + 1
+        conn.executemany(f'''
+            INSERT INTO {table} (host, bucket, name_id, cpu_total, cpu_max, memory_total, memory_max, samples) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (host, bucket, name_id) DO UPDATE SET
+                cpu_total = cpu_total + excluded.cpu_total, cpu_max = MAX(cpu_max, excluded.cpu_max),
+                memory_total = memory_total + excluded.memory_total, memory_max = MAX(memory_max, excluded.memory_max),
+                samples = samples + excluded.samples''',
+            [(host, bucket, name_id, *agg) for (bucket, name_id), agg in buckets.items()])
+
+    def _rollup(self, conn, host, rows):
+        # fold only the new rows into each tier; (min, max, total, samples) merge exactly
+        columns = [(metric, self.METRIC_COLUMNS.index(metric) + 1) for metric in self.ROLLUP_METRICS]
+        for table, step, _ in self.ROLLUPS:
+            buckets = {}
+            for row in rows:
+                bucket = row[0] // step * step
+                for metric, column in columns:
+                    value = row[column]
+                    if value is None: continue
+                    agg = buckets.get((bucket, metric))
+                    if agg is None: buckets[(bucket, metric)] = [value, value, value, 1]
+                    else: agg[0], agg[1], agg[2], agg[3] = min(agg[0], value), max(agg[1], value), agg[2] + value, agg[3] + 1
+            conn.executemany(f'''
+                INSERT INTO {table} (host, bucket, metric, min_value, max_value, total, samples) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (host, bucket, metric) DO UPDATE SET
+                    min_value = MIN(min_value, excluded.min_value), max_value = MAX(max_value, excluded.max_value),
+                    total = total + excluded.total, samples = samples + excluded.samples''',
+                [(host, bucket, metric, *agg) for (bucket, metric), agg in buckets.items()])
+
+    def parse_samples(self, samples):
+        """Próbki agenta (słowniki z nazwami kolumn) na wiersze jak w save_metrics; ValueError przy złych danych"""
+        rows, processes = [], []
+        now = int(time.time())
+        oldest, newest = now - self.ROLLUPS[-1][2] * 86400, now + self.INGEST_MAX_SKEW
+        for sample in samples:
+            timestamp = int(sample['timestamp'])
+            if not oldest <= timestamp <= newest: raise ValueError(f'timestamp {sample["timestamp"]!r} is outside {oldest}..{newest}')
+            # an agent clock slightly ahead is stored as now, so no bucket lies in the future
+            timestamp = min(timestamp, now)
+            row = [timestamp]
+            for column in self.METRIC_COLUMNS:
+                value = sample.get(column)
+                if value is not None and column != 'zone_temps':
+                    value = float(value)
+                    if value != value or value in (float('inf'), float('-inf')): raise ValueError(f'{column} is not finite')
+                elif value is not None and not isinstance(value, str): raise ValueError('zone_temps must be a JSON string')
+                row.append(value)
+            rows.append(tuple(row))
+            for name, cpu, memory, pid in sample.get('processes', []):
+                if not isinstance(name, str) or not name: raise ValueError(f'process name {name!r} is not a non-empty string')
+                cpu, memory = float(cpu), float(memory)
+                # a NaN would be stored as NULL and stay NULL in the process rollup
+                if not math.isfinite(cpu) or not math.isfinite(memory): raise ValueError(f'{name} cpu or memory is not finite')
+                processes.append((timestamp, name, cpu, memory, int(pid)))
+        return rows, processes
+
+    def ingest(self, host, agent, seq, samples):
+        """Zapisuje partię zdalnego agenta w jednej transakcji; False, jeśli ta partia była już zapisana"""
+        rows, processes = self.parse_samples(samples)
+        with self._write_lock:
+            try:
+                with self.timed('ingest'), self.writer() as conn:
+                    if not conn.execute('INSERT OR IGNORE INTO ingest_batches (host, agent, seq, received, samples) VALUES (?, ?, ?, ?, ?)',
+                                        (host, agent, seq, int(time.time()), len(rows))).rowcount: return False
+                    newest = conn.execute('SELECT MAX(timestamp) FROM system_metrics WHERE host = ?', (host,)).fetchone()[0]
+                    if rows and newest is not None and min(row[0] for row in rows) < newest:
+                        # the samples may fall into chunks that are sealed and cached in every worker
+                        conn.execute('INSERT INTO host_revisions (host, revision) VALUES (?, 1) ON CONFLICT (host) DO UPDATE SET revision = revision + 1', (host,))
+                    self._store(conn, host, rows, processes)
+            except Exception:
+                self.process_ids.clear()
+                raise
+        return True
+
+    def hosts(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute('SELECT host, MAX(timestamp) FROM system_metrics GROUP BY host').fetchall()
+        finally:
+            conn.close()
+        return [{'host': host, 'last_seen': last_seen, 'local': host == self.host} for host, last_seen in rows]
+
+    def _prune(self):
+        self.last_prune = time.monotonic()
+        try:
+            now = int(time.time())
+            cutoff = now - self.retention_days * 86400
+            with self.timed('prune'), self.writer() as conn:
+                conn.execute('DELETE FROM system_metrics WHERE timestamp < ?', (cutoff,))
+                conn.execute('DELETE FROM top_processes WHERE timestamp < ?', (cutoff,))
+                conn.execute('DELETE FROM ingest_batches WHERE received < ?', (cutoff,))
+                conn.execute(f'DELETE FROM {self.PROCESS_ROLLUP[0]} WHERE bucket < ?', (now - self.PROCESS_ROLLUP[2] * 86400,))
+                for table, _, days in self.ROLLUPS:
+                    conn.execute(f'DELETE FROM {table} WHERE bucket < ?', (now - days * 86400,))
+        except Exception as e: print(f"Error pruning metrics: {e}")
+
+    def timed(self, query):
+        return REGISTRY.histogram('sqlite_query_duration_seconds', 'SQLite statement time in ExtendedMonitoring', query=query).time()
+
+    def pick_rollup(self, hours, limit=None):
+        """Najdrobniejszy poziom, który pokrywa zakres i mieści się w limicie punktów; bez limitu (format listy) co najmniej godzinowy"""
+        # the list format has always had one point per hour, so it stays on metrics_1h for every range that tier keeps
+        tiers = self.ROLLUPS if limit else [tier for tier in self.ROLLUPS if tier[1] >= 3600]
+        for table, step, days in tiers:
+            if hours <= days * 24 and (not limit or hours * 3600 // step <= limit): return table, step
+        return self.ROLLUPS[-1][:2]
+
+    def history_key(self, hours, limit=None, host=None):
+        """(tabela, krok, początek zakresu, wersja danych, host, rewizja); wersja to ostatni zapisany pomiar hosta"""
+        table, step = self.pick_rollup(hours, limit)
+        days = next(days for name, _, days in self.ROLLUPS if name == table)
+        # nothing older than the tier's retention is kept, so the chunks never reach back further
+        start = int(time.time() - min(hours * 3600, days * 86400)) // step * step
+        host = host or self.host
+        try:
+            conn = sqlite3.connect(self.db_path)
+            with self.timed('history_version'):
+                version = conn.execute('SELECT MAX(timestamp) FROM system_metrics WHERE host = ?', (host,)).fetchone()[0] or 0
+                revision = conn.execute('SELECT revision FROM host_revisions WHERE host = ?', (host,)).fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"Error reading history version: {e}")
+            version, revision = 0, None
+        return table, step, start, version, host, revision[0] if revision else 0
+
+    def history_chunk(self, conn, table, host, start, end):
+        with self.timed('history_chunk'):
+            rows = conn.execute(f'SELECT bucket, metric, min_value, max_value, total, samples FROM {table} WHERE host = ? AND bucket >= ? AND bucket < ? ORDER BY bucket ASC',
+                                (host, start, end)).fetchall()
+        buckets = {}
+        for bucket, metric, *agg in rows: buckets.setdefault(bucket, {})[metric] = agg
+        return list(buckets.items())
+
+    def history_buckets(self, key):
+        """[(bucket, {metryka: (min, max, suma, próbki)})] od początku zakresu do teraz"""
+        table, step, start, version, host, revision = key
+        # each host's samples are stored in time order, so every bucket that ends before its newest stored sample is final
+        sealed = version // step * step
+        span = step * self.HISTORY_CHUNK_BUCKETS
+        conn = sqlite3.connect(self.db_path)
+        try:
+            buckets = []
+            for chunk in range(start // span * span, int(time.time()) + 1, span):
+                if chunk + span <= sealed:
+                    rows = self.history_cache.get((table, host, revision, chunk))
+                    if rows is None: rows = self.history_cache.set((table, host, revision, chunk), self.history_chunk(conn, table, host, chunk, chunk + span))
+                else:
+                    rows = self.history_chunk(conn, table, host, chunk, chunk + span)
+                buckets.extend(row for row in rows if row[0] >= start)
+            return buckets
+        finally:
+            conn.close()
+
+    def get_history(self, hours=24, key=None, host=None):
+        try:
+            history = []
+            for bucket, aggs in self.history_buckets(key or self.history_key(hours, host=host)):
+                point = {'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(bucket)), **dict.fromkeys(self.HISTORY_METRICS, 0)}
+                for metric in self.HISTORY_METRICS:
+                    if metric in aggs: point[metric] = round(aggs[metric][2] / aggs[metric][3] if aggs[metric][3] else 0, 1)
+                history.append(point)
+            return history
+        except Exception as e:
+            print(f"Error getting history: {e}")
+            return []
+
+    def ring_values(self, data):
+        network, sensors = data.get('network', {}), data.get('sensors', {})
+        return {
+            'cpu_percent': data.get('cpu_percent'), 'ram_percent': data.get('memory', {}).get('percent'),
+            'disk_percent': data.get('disk', {}).get('percent'), 'temperature': data.get('temperature'),
+            'load_avg_1m': data.get('load_avg'), 'ping_ms': data.get('ping', {}).get('ping_ms'), 'cpu_freq_mhz': sensors.get('cpu_freq_mhz'),
+            'network_sent_bytes_s': network.get('sent_bytes_s'), 'network_recv_bytes_s': network.get('recv_bytes_s'),
+            'network_errors_s': network.get('errors_s'), 'active_connections': network.get('active_connections')}
+
+    def recent_history_columnar(self, hours, points=500, minmax=False):
+        """Zakres mieszczący się w buforze pamięci; starszą część (np. po restarcie) uzupełniają surowe wiersze z SQLite"""
+        now = int(time.time())
+        span = max(int(hours * 3600), 1)
+        step = max(self.ring.resolution, -(-span // max(points, 1)))
+        while 86400 % step: step += 1
+        start = (now - span) // step * step
+        n = (now - start) // step + 1
+        means, mins, maxs = (np.full((len(self.ring.metrics), n), np.nan) for _ in range(3))
+        oldest = self.ring.oldest
+        if oldest is None: ring_from = now + 1
+        elif oldest <= start: ring_from = start
+        # the ring starts at its first whole bucket; everything before comes from SQLite
+        else: ring_from = start + -(-(oldest - start) // step) * step
+        if ring_from > start:
+            columns = ', '.join(f'AVG({m}), MIN({m}), MAX({m})' for m in self.ring.metrics)
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with self.timed('history_raw'):
+                    rows = conn.execute(f'SELECT (timestamp - ?) / ?, {columns} FROM system_metrics WHERE host = ? AND timestamp >= ? AND timestamp < ? GROUP BY 1',
+                                        (start, step, self.host, start, ring_from)).fetchall()
+            finally:
+                conn.close()
+            for i, *aggs in rows:
+                values = np.array(aggs, dtype=float).reshape(-1, 3)
+                means[:, i], mins[:, i], maxs[:, i] = values[:, 0], values[:, 1], values[:, 2]
+        if ring_from <= now:
+            offset = (ring_from - start) // step
+            buckets, ring_means, ring_mins, ring_maxs = self.ring.aggregate(ring_from, step)
+            index = buckets + offset
+            means[:, index], mins[:, index], maxs[:, index] = ring_means, ring_mins, ring_maxs
+        as_list = lambda row: [None if value != value else round(value, 2) for value in row.tolist()]
+        result = {'start': start, 'step': step, 'tier': 'memory', 'series': {m: as_list(means[i]) for i, m in enumerate(self.ring.metrics)}}
+        if minmax:
+            result['min'] = {m: as_list(mins[i]) for i, m in enumerate(self.ring.metrics)}
+            result['max'] = {m: as_list(maxs[i]) for i, m in enumerate(self.ring.metrics)}
+        return result
+
+    def get_history_columnar(self, hours=24, points=500, minmax=False, key=None, host=None):
+        """Jedna tablica na serię, start + step zamiast znaczników czasu, najwyżej points punktów"""
+        host = host or self.host
+        # only this host has an in-memory ring; remote hosts are served from their rollups
+        if host == self.host and hours * 3600 <= self.ring.span: return self.recent_history_columnar(hours, points, minmax)
+        key = key or self.history_key(hours, self.COLUMNAR_MAX_BUCKETS, host)
+        table, step, start, *_ = key
+        now = int(time.time())
+        # merging whole rollup buckets keeps min, max and mean exact; steps that divide a day stay aligned to the clock
+        factor = max(1, int(-(-hours * 3600 // (step * max(points, 1)))))
+        while 86400 % (step * factor) and (step * factor) % 86400: factor += 1
+        out_step = step * factor
+        out_start = start // out_step * out_step
+        n = (now - out_start) // out_step + 1
+        acc = {metric: [None] * n for metric in self.ROLLUP_METRICS}
+        for bucket, aggs in self.history_buckets(key):
+            i = (bucket - out_start) // out_step
+            if not 0 <= i < n: continue
+            for metric, (lo, hi, total, samples) in aggs.items():
+                if metric not in acc or not samples: continue
+                cell = acc[metric][i]
+                if cell is None: acc[metric][i] = [lo, hi, total, samples]
+                else: cell[0], cell[1], cell[2], cell[3] = min(cell[0], lo), max(cell[1], hi), cell[2] + total, cell[3] + samples
+        series, mins, maxs = {}, {}, {}
+        for metric, cells in acc.items():
+            series[metric] = [round(c[2] / c[3], 2) if c else None for c in cells]
+            if minmax: mins[metric], maxs[metric] = [c and round(c[0], 2) for c in cells], [c and round(c[1], 2) for c in cells]
+        result = {'start': out_start, 'step': out_step, 'tier': table, 'series': series}
+        if minmax: result.update({'min': mins, 'max': maxs})
+        return result
+
+    def top_processes(self, hours=24, by='cpu', limit=10, host=None):
+        """Procesy, które w zakresie najbardziej obciążały CPU (by='cpu') lub pamięć (by='memory'), z godzinnych agregatów"""
+        table, step, _ = self.PROCESS_ROLLUP
+        host = host or self.host
+        start = int(time.time() - hours * 3600) // step * step
+        order = 'SUM(r.memory_total)' if by == 'memory' else 'SUM(r.cpu_total)'
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with self.timed('process_top'):
+                # a process is only stored while it is in the top list, so shares are taken over every recorded sample of the host
+                snapshots = conn.execute("SELECT SUM(samples) FROM metrics_1h WHERE host = ? AND metric = 'cpu_percent' AND bucket >= ?",
+                                         (host, start)).fetchone()[0]
+                rows = conn.execute(f'''
+                    SELECT n.name, SUM(r.cpu_total), MAX(r.cpu_max), SUM(r.memory_total), MAX(r.memory_max), SUM(r.samples)
+                    FROM {table} r JOIN process_names n ON n.id = r.name_id WHERE r.host = ? AND r.bucket >= ?
+                    GROUP BY r.name_id ORDER BY {order} DESC LIMIT ?''', (host, start, limit)).fetchall()
+        finally:
+            conn.close()
+        snapshots = max(snapshots or 0, max((row[5] for row in rows), default=0), 1)
+        return [{'name': name, 'cpu_mean': round(cpu / snapshots, 2), 'cpu_avg': round(cpu / samples, 2), 'cpu_max': round(cpu_max, 2),
+                 'memory_avg_mb': round(memory / samples, 1), 'memory_max_mb': round(memory_max, 1), 'samples': samples,
+                 'presence_percent': round(100 * samples / snapshots, 1)}
+                for name, cpu, cpu_max, memory, memory_max, samples in rows]
+
+    def process_history(self, name, hours=24, points=200, host=None):
+        """Przebieg CPU i pamięci jednego procesu w formacie kolumnowym; None, jeśli nazwa jest nieznana"""
+        table, rollup_step, _ = self.PROCESS_ROLLUP
+        host = host or self.host
+        now = int(time.time())
+        span = max(int(hours * 3600), 1)
+        step = max(60, -(-span // max(points, 1)))
+        # raw rows while they are still kept and the step is finer than the rollup, whole rollup buckets otherwise
+        raw = step < rollup_step and span <= self.retention_days * 86400
+        if not raw: step = -(-step // rollup_step) * rollup_step
+        while 86400 % step and step % 86400: step += 1 if raw else rollup_step
+        start = (now - span) // step * step
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('SELECT id FROM process_names WHERE name = ?', (name,)).fetchone()
+            if row is None: return None
+            with self.timed('process_history'):
+                if raw:
+                    rows = conn.execute('''
+                        SELECT (timestamp - ?) / ?, SUM(cpu_percent), MAX(cpu_percent), SUM(memory_mb), MAX(memory_mb), COUNT(*)
+                        FROM top_processes WHERE name_id = ? AND timestamp >= ? AND host = ? GROUP BY 1''', (start, step, row[0], start, host)).fetchall()
+                else:
+                    rows = conn.execute(f'''
+                        SELECT (bucket - ?) / ?, SUM(cpu_total), MAX(cpu_max), SUM(memory_total), MAX(memory_max), SUM(samples)
+                        FROM {table} WHERE host = ? AND name_id = ? AND bucket >= ? GROUP BY 1''', (start, step, host, row[0], start)).fetchall()
+        finally:
+            conn.close()
+        n = (now - start) // step + 1
+        series = {key: [None] * n for key in ('cpu_avg', 'cpu_max', 'memory_avg_mb', 'memory_max_mb', 'samples')}
+        for i, cpu, cpu_max, memory, memory_max, samples in rows:
+            if not 0 <= i < n: continue
+            series['cpu_avg'][i], series['cpu_max'][i] = round(cpu / samples, 2), round(cpu_max, 2)
+            series['memory_avg_mb'][i], series['memory_max_mb'][i] = round(memory / samples, 1), round(memory_max, 1)
+            series['samples'][i] = samples
+        return {'name': name, 'host': host, 'start': start, 'step': step, 'tier': 'top_processes' if raw else table, 'series': series}
+
+extended_monitor = ExtendedMonitoring()
+atexit.register(extended_monitor.flush)
+# agent mode: every recorded sample is also buffered and pushed to the central dashboard
+ingest_agent = IngestAgent(
+    os.getenv('INGEST_URL'), os.getenv('INGEST_TOKEN', ''), extended_monitor.host,
+    os.getenv('INGEST_BUFFER', os.path.join(os.path.dirname(extended_monitor.db_path), 'ingest-buffer.db')),
+    batch_size=int(os.getenv('INGEST_BATCH_SIZE', '60')), interval=int(os.getenv('INGEST_PUSH_INTERVAL', '30'))) if os.getenv('INGEST_URL') else None
+
+sensor_reader = SensorReader(os.getenv('SYSFS_ROOT', '/sys'))
+
+def collect_uptime():
+    try:
+        uptime_seconds = time.time() - psutil.boot_time()
+        uptime = f"{int(uptime_seconds // 3600)}h {int((uptime_seconds % 3600) // 60)}m"
+    except Exception: uptime = "N/A"
+    return {'uptime': uptime, 'load_avg': round(os.getloadavg()[0], 2) if hasattr(os, 'getloadavg') else 0}
+
+def record_metrics():
+    snapshot = metrics_sampler.snapshot
+    if not snapshot: return
+    row, processes = extended_monitor.save_metrics(snapshot.data)
+    if ingest_agent:
+        ingest_agent.add({**dict(zip(('timestamp',) + extended_monitor.METRIC_COLUMNS, row)), 'processes': [proc[1:] for proc in processes]})
+
+# (name, collector, interval s, timeout s); intervals can be overridden with COLLECTOR_INTERVALS="cpu=2,connections=60"
+COLLECTORS = [
+    ('cpu', lambda: {'cpu_percent': psutil.cpu_percent(interval=None)}, 1, 1),
+    ('memory', lambda: {'memory': psutil.virtual_memory()._asdict()}, 2, 1),
+    ('disk', lambda: {'disk': psutil.disk_usage('/')._asdict()}, 30, 2),
+    ('sensors', sensor_reader.read, 5, 2),
+    ('uptime', collect_uptime, 5, 1),
+    ('network', lambda: {'network': extended_monitor.get_network_metrics()}, 5, 1),
+    ('connections', lambda: {'network': extended_monitor.get_connections()}, 10, 2),
+    ('processes', lambda: {'processes': extended_monitor.get_top_processes()}, 10, 5),
+    ('ping', lambda: {'ping': extended_monitor.ping_test()}, 10, 1),
+    ('record', record_metrics, int(os.getenv('SAMPLE_INTERVAL', '10')), 5)]
+
+# under gunicorn every worker imports the app; only the holder of this lock collects and writes to the database
+collector_lock = LeaderLock(os.getenv('COLLECTOR_LOCK', os.path.join(SHARED_DIR, 'gingerity-collector.lock')))
+shared_snapshot = SharedSlot(os.getenv('SNAPSHOT_SHM', os.path.join(SHARED_DIR, 'gingerity-snapshot')), 1024 * 1024)
+
+def share_snapshot(snapshot):
+    # followers replay every snapshot too, so each worker fills its own in-memory history
+    extended_monitor.ring.append(snapshot.collected_at, extended_monitor.ring_values(snapshot.data))
+    if collector_lock.held and not shared_snapshot.write(snapshot.seq, snapshot.json.encode()):
+        print("Snapshot does not fit in shared memory")
+
+metrics_sampler = MetricsSampler(on_timing=lambda name, seconds: REGISTRY.histogram(
+    'collector_duration_seconds', 'Time spent in one collector run', collector=name).observe(seconds), on_publish=share_snapshot)
+collector_intervals = dict(item.split('=', 1) for item in os.getenv('COLLECTOR_INTERVALS', '').split(',') if '=' in item)
+for name, collector, interval, timeout in COLLECTORS:
+    metrics_sampler.register(name, collector, float(collector_intervals.get(name, interval)), timeout)
+
+def start_collection(on_start=None):
+    print(f"Worker {os.getpid()} collects metrics")
+    if on_start: on_start()
+    extended_monitor.prober.start()
+    metrics_sampler.start()
+    if ingest_agent: ingest_agent.start()
+
+def follow_collection(on_start=None):
+    """Worker bez blokady odtwarza snapshoty z pamięci współdzielonej i przejmuje zbieranie, gdy zbierający zniknie"""
+    seq = None
+    while not collector_lock.acquire():
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            seq, payload = shared_snapshot.read(seq)
+            if payload:
+                try: metrics_sampler.publish(json.loads(payload), seq=seq, encoded=payload.decode())
+                except ValueError: pass
+            time.sleep(0.2)
+    start_collection(on_start)
+
+def elect(on_start=None):
+    """Zbiera pomiary, jeśli ten proces zdobędzie blokadę, a inaczej śledzi zbierającego; on_start wołane przy przejęciu zbierania"""
+    if collector_lock.acquire(): start_collection(on_start)
+    else: threading.Thread(target=follow_collection, args=(on_start,), name='collection-follower', daemon=True).start()
@@ -0,0 +1,63 @@
+# network.py
+import os
+import time
+
+import psutil
+
+# st column of /proc/net/tcp and tcp6
+TCP_STATES = {
+    b'01': 'established', b'02': 'syn_sent', b'03': 'syn_recv', b'04': 'fin_wait1', b'05': 'fin_wait2', b'06': 'time_wait',
+    b'07': 'close', b'08': 'close_wait', b'09': 'last_ack', b'0A': 'listen', b'0B': 'closing', b'0C': 'new_syn_recv'}
+COUNTERS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout')
+
+
+def counter_delta(previous, current):
+    """Przyrost licznika; spadek wartości to reset (restart sterownika, nowy interfejs), więc liczymy od zera"""
+    return current - previous if current >= previous else current
+
+
+def connection_states(procfs='/proc'):
+    """Liczba gniazd TCP w każdym stanie, z /proc/net/tcp* zamiast psutil.net_connections()"""
+    states = {}
+    for name in ('tcp', 'tcp6'):
+        try:
+            with open(os.path.join(procfs, 'net', name), 'rb') as f: lines = f.read().splitlines()[1:]
+        except OSError: continue
+        for line in lines:
+            state = TCP_STATES.get(line.split(None, 4)[3], 'unknown')
+            states[state] = states.get(state, 0) + 1
+    return states
+
+
+class NetworkRates:
+    """Przepustowość na interfejs z różnicy liczników między kolejnymi odczytami"""
+
+    def __init__(self, skip=('lo',)):
+        self.skip = skip
+        self.previous = {}
+        self.previous_at = None
+        # sums of reset-corrected deltas: never go backwards, so any reader can turn them into a rate
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+    def sample(self):
+        counters = {nic: c for nic, c in psutil.net_io_counters(pernic=True).items() if nic not in self.skip}
+        now = time.monotonic()
+        elapsed = now - self.previous_at if self.previous_at else 0
+        interfaces = {}
+        for nic, current in counters.items():
+            before = self.previous.get(nic)
+            if before is None: continue
+            delta = {field: counter_delta(getattr(before, field), getattr(current, field)) for field in COUNTERS}
+            for field, value in delta.items(): self.totals[field] += value
+            if elapsed > 0:
+                interfaces[nic] = {
+                    'sent_bytes_s': round(delta['bytes_sent'] / elapsed), 'recv_bytes_s': round(delta['bytes_recv'] / elapsed),
+                    'sent_packets_s': round(delta['packets_sent'] / elapsed, 1), 'recv_packets_s': round(delta['packets_recv'] / elapsed, 1),
+                    'errors_s': round((delta['errin'] + delta['errout']) / elapsed, 2), 'drops_s': round((delta['dropin'] + delta['dropout']) / elapsed, 2)}
+        self.previous, self.previous_at = counters, now
+        total = lambda key: sum(nic[key] for nic in interfaces.values())
+        return {
+            'bytes_sent_mb': round(sum(c.bytes_sent for c in counters.values()) / 1024 / 1024, 2),
+            'bytes_recv_mb': round(sum(c.bytes_recv for c in counters.values()) / 1024 / 1024, 2),
+            'sent_bytes_s': total('sent_bytes_s'), 'recv_bytes_s': total('recv_bytes_s'), 'errors_s': round(total('errors_s'), 2),
+            'interfaces': interfaces, 'totals': {**self.totals, 'at': now}}
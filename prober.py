@@ -0,0 +1,124 @@
+# prober.py
+import asyncio
+import itertools
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+_icmp_seq = itertools.count(1)
+
+
+def icmp_checksum(data):
+    if len(data) % 2: data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def icmp_allowed():
+    """Czy jądro pozwala na nieuprzywilejowane gniazda ICMP (net.ipv4.ping_group_range)"""
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+        return True
+    except OSError:
+        return False
+
+
+async def icmp_probe(host, timeout):
+    loop = asyncio.get_running_loop()
+    address = (await loop.getaddrinfo(host, None, family=socket.AF_INET))[0][4][0]
+    seq = next(_icmp_seq) & 0xFFFF
+    header = struct.pack('!BBHHH', 8, 0, 0, 0, seq)
+    payload = struct.pack('!d', time.monotonic())
+    packet = struct.pack('!BBHHH', 8, 0, icmp_checksum(header + payload), 0, seq) + payload
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP) as sock:
+        sock.setblocking(False)
+        await loop.sock_connect(sock, (address, 0))
+        started = time.monotonic()
+        await loop.sock_sendall(sock, packet)
+        async def reply():
+            # datagram ICMP sockets deliver the ICMP header without the IP header; the kernel rewrites the id
+            while True:
+                data = await loop.sock_recv(sock, 1024)
+                if len(data) >= 8 and data[0] == 0 and struct.unpack('!H', data[6:8])[0] == seq: return
+        await asyncio.wait_for(reply(), timeout)
+        return (time.monotonic() - started) * 1000
+
+
+async def tcp_probe(host, port, timeout):
+    started = time.monotonic()
+    _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    elapsed = (time.monotonic() - started) * 1000
+    writer.close()
+    return elapsed
+
+
+class TargetStats:
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.last = None
+
+    def add(self, latency):
+        self.last = latency
+        self.samples.append(latency)
+
+    def summary(self):
+        samples = list(self.samples)
+        ok = sorted(s for s in samples if s is not None)
+        pick = lambda q: round(ok[min(len(ok) - 1, int(q * len(ok)))], 1) if ok else None
+        return {
+            'success': self.last is not None, 'ping_ms': round(self.last, 1) if self.last is not None else None,
+            'p50_ms': pick(0.5), 'p95_ms': pick(0.95),
+            'loss_percent': round(100 * (len(samples) - len(ok)) / len(samples), 1) if samples else None}
+
+
+class LatencyProber:
+    """Asynchroniczny pomiar opóźnień do wielu celów we własnym wątku"""
+
+    def __init__(self, targets, interval=10, timeout=3, window=60, tcp_port=443, probe=None):
+        self.targets = list(targets)
+        self.interval = interval
+        self.timeout = timeout
+        self.tcp_port = tcp_port
+        self.stats = {target: TargetStats(window) for target in self.targets}
+        self.use_icmp = icmp_allowed()
+        self.probe = probe or self.default_probe
+        self._thread = None
+
+    async def default_probe(self, target):
+        host, _, port = target.rpartition(':') if ':' in target else (target, '', '')
+        if port: return await tcp_probe(host, int(port), self.timeout)
+        if self.use_icmp: return await icmp_probe(host, self.timeout)
+        return await tcp_probe(host, self.tcp_port, self.timeout)
+
+    async def measure(self, target):
+        try:
+            latency = await asyncio.wait_for(self.probe(target), self.timeout)
+        except (OSError, asyncio.TimeoutError, ValueError):
+            latency = None
+        self.stats[target].add(latency)
+
+    async def run_once(self):
+        await asyncio.gather(*(self.measure(target) for target in self.targets))
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            await self.run_once()
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name='latency-prober', daemon=True)
+        self._thread.start()
+
+    def summary(self, target=None):
+        """Statystyki celu (domyślnie pierwszego): last, p50, p95, strata %"""
+        return self.stats[target or self.targets[0]].summary()
+
+    def summaries(self):
+        return {target: stats.summary() for target, stats in self.stats.items()}
+
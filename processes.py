@@ -0,0 +1,66 @@
+# processes.py
+import heapq
+import os
+import time
+
+import psutil
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class TrackedProcess:
+    __slots__ = ('pid', 'create_time', 'name', 'cpu_total', 'seen_at', 'cpu_percent', 'rss')
+
+    def __init__(self, pid, create_time, name, cpu_total, rss, seen_at):
+        self.pid, self.create_time, self.name = pid, create_time, name
+        self.cpu_total, self.rss, self.seen_at = cpu_total, rss, seen_at
+        self.cpu_percent = 0.0
+
+
+class ProcessTracker:
+    """Trwała tablica procesów między pomiarami, klucz (pid, create_time)"""
+
+    def __init__(self, procfs='/proc'):
+        self.procfs = procfs if os.path.isdir(os.path.join(procfs, 'self')) else None
+        self.table = {}
+
+    def read_stat(self, pid):
+        """(create_time, czas CPU w s, RSS w bajtach) jednym odczytem /proc/<pid>/stat"""
+        if self.procfs is None:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                times = proc.cpu_times()
+                return proc.create_time(), times.user + times.system, proc.memory_info().rss
+        with open(f'{self.procfs}/{pid}/stat', 'rb') as f: data = f.read()
+        # comm may contain spaces and parentheses, the fields start after the last ')'
+        fields = data[data.rindex(b')') + 2:].split()
+        return int(fields[19]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE
+
+    def sample(self):
+        """Odśwież CPU i RSS wszystkich procesów; nowe procesy startują z 0% CPU"""
+        now = time.monotonic()
+        table = {}
+        for pid in psutil.pids():
+            try:
+                create_time, cpu_total, rss = self.read_stat(pid)
+                key = (pid, create_time)
+                entry = self.table.get(key)
+                if entry is None:
+                    # the name never changes for a given (pid, create_time), so it is read once
+                    entry = TrackedProcess(pid, create_time, psutil.Process(pid).name(), cpu_total, rss, now)
+                else:
+                    elapsed = now - entry.seen_at
+                    entry.cpu_percent = round((cpu_total - entry.cpu_total) / elapsed * 100, 1) if elapsed > 0 else 0.0
+                    entry.cpu_total, entry.rss, entry.seen_at = cpu_total, rss, now
+                table[key] = entry
+            except (OSError, ValueError, IndexError, psutil.Error): continue
+        self.table = table
+        return table
+
+    def top(self, limit=5):
+        entries = self.sample().values()
+        as_dict = lambda e: {'pid': e.pid, 'name': e.name, 'cpu_percent': e.cpu_percent, 'memory_mb': round(e.rss / 1024 / 1024, 1)}
+        return {
+            'top_cpu': [as_dict(e) for e in heapq.nlargest(limit, entries, key=lambda e: e.cpu_percent)],
+            'top_ram': [as_dict(e) for e in heapq.nlargest(limit, entries, key=lambda e: e.rss)]}
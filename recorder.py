@@ -0,0 +1,130 @@
+# recorder.py
+import os
+import queue
+import threading
+import time
+
+import psutil
+
+
+class Recorder:
+    """Nagrywa segmenty MJPEG albo klatki time-lapse z tego samego przechwytywania kamery"""
+
+    def __init__(self, capture, directory, mode='segments', segment_seconds=300, interval=60,
+                 quota_bytes=2 * 1024 ** 3, max_disk_percent=90, queue_size=64):
+        if mode not in ('segments', 'timelapse'): raise ValueError(f"Unknown recording mode: {mode}")
+        self.capture, self.directory, self.mode = capture, directory, mode
+        self.segment_seconds, self.interval = segment_seconds, interval
+        self.quota_bytes, self.max_disk_percent = quota_bytes, max_disk_percent
+        self.frames_written = self.frames_dropped = self.bytes_written = self.evicted = 0
+        self.current = None
+        self.segment_bytes = 0
+        self.stopped_reason = None
+        self.running = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._last_quota_check = 0.0
+        self._bytes_since_check = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        threading.Thread(target=self._tap, name='recorder-tap', daemon=True).start()
+        threading.Thread(target=self._write, name='recorder-writer', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _tap(self):
+        # the tap is an ordinary viewer: it never holds up the capture, and a full queue drops frames
+        frames = self.capture.frames()
+        next_at = 0.0
+        try:
+            for frame in frames:
+                if self._stop.is_set(): break
+                if self.mode == 'timelapse':
+                    if time.monotonic() < next_at: continue
+                    next_at = time.monotonic() + self.interval
+                try: self._queue.put_nowait((time.time(), frame))
+                except queue.Full: self.frames_dropped += 1
+        except Exception as e:
+            print(f"Error in recorder tap: {e}")
+        finally:
+            frames.close()
+            # the writer may have stopped on its own and no longer drain the queue
+            try: self._queue.put(None, timeout=5)
+            except queue.Full: pass
+
+    def _write(self):
+        segment, segment_end = None, 0.0
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None: break
+                timestamp, frame = item
+                if self.mode == 'timelapse':
+                    name = time.strftime('timelapse_%Y%m%d_%H%M%S.jpg', time.localtime(timestamp))
+                    # intervals under a second put several frames into the same second
+                    if os.path.exists(os.path.join(self.directory, name)):
+                        name = time.strftime('timelapse_%Y%m%d_%H%M%S', time.localtime(timestamp)) + f'_{self.frames_written}.jpg'
+                    with open(os.path.join(self.directory, name), 'wb') as f: f.write(frame)
+                    if not self.enforce_quota(): break
+                else:
+                    # a segment never grows past half the quota, so the previous one can be evicted while it is written
+                    if segment is None or timestamp >= segment_end or self.segment_bytes + len(frame) > self.quota_bytes // 2:
+                        if segment: segment.close()
+                        self.current = time.strftime('segment_%Y%m%d_%H%M%S.mjpeg', time.localtime(timestamp))
+                        if os.path.exists(os.path.join(self.directory, self.current)):
+                            self.current = time.strftime('segment_%Y%m%d_%H%M%S', time.localtime(timestamp)) + f'_{self.frames_written}.mjpeg'
+                        segment = open(os.path.join(self.directory, self.current), 'ab', buffering=1024 * 1024)
+                        segment_end = timestamp + self.segment_seconds
+                        self.segment_bytes = 0
+                        if not self.enforce_quota(): break
+                    segment.write(frame)
+                    self.segment_bytes += len(frame)
+                    # checked by time and by volume: at full resolution 30 s alone can be hundreds of megabytes
+                    if (time.monotonic() - self._last_quota_check > 30 or self._bytes_since_check > self.quota_bytes // 16) \
+                            and not self.enforce_quota(): break
+                self.frames_written += 1
+                self.bytes_written += len(frame)
+                self._bytes_since_check += len(frame)
+        except Exception as e:
+            print(f"Error writing recording: {e}")
+        finally:
+            self._stop.set()
+            if segment: segment.close()
+            self.current = None
+            self.running = False
+
+    def recordings(self):
+        """Pliki nagrań od najstarszego: [(nazwa, rozmiar)]"""
+        entries = [e for e in os.scandir(self.directory) if e.is_file() and e.name.startswith(('segment_', 'timelapse_'))]
+        return [(e.name, e.stat().st_size) for e in sorted(entries, key=lambda e: e.stat().st_mtime)]
+
+    def enforce_quota(self):
+        """Usuwa najstarsze nagrania ponad limit bajtów albo przy zbyt zapełnionym dysku; False, gdy trzeba przerwać nagrywanie"""
+        self._last_quota_check, self._bytes_since_check = time.monotonic(), 0
+        files = [f for f in self.recordings() if f[0] != self.current]
+        # the segment being written counts too; its buffered tail is not on disk yet, so use what was written to it
+        total = sum(size for _, size in files) + (self.segment_bytes if self.current else 0)
+        while files and (total > self.quota_bytes or psutil.disk_usage(self.directory).percent > self.max_disk_percent):
+            name, size = files.pop(0)
+            try: os.remove(os.path.join(self.directory, name))
+            except OSError: continue
+            total -= size
+            self.evicted += 1
+        if psutil.disk_usage(self.directory).percent > self.max_disk_percent:
+            print("Disk is above the recording limit and there is nothing left to evict, stopping the recording")
+            self.stopped_reason = 'disk_full'
+            return False
+        if total > self.quota_bytes:
+            self.stopped_reason = 'quota'
+            return False
+        return True
+
+    def status(self):
+        return {
+            'running': self.running, 'mode': self.mode, 'current': self.current, 'segment_seconds': self.segment_seconds,
+            'interval': self.interval, 'frames_written': self.frames_written, 'frames_dropped': self.frames_dropped,
+            'bytes_written': self.bytes_written, 'evicted': self.evicted, 'stopped_reason': self.stopped_reason}
@@ -0,0 +1,66 @@
+# ring.py
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    """Ostatnie capacity pomiarów w prealokowanych tablicach NumPy, jeden wiersz na metrykę"""
+
+    def __init__(self, metrics, capacity=3600, resolution=1):
+        self.metrics = tuple(metrics)
+        self.capacity, self.resolution = capacity, resolution
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((len(self.metrics), capacity), np.nan, dtype=np.float32)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def span(self):
+        return self.capacity * self.resolution
+
+    @property
+    def oldest(self):
+        if not self.count: return None
+        return int(self.times[self.count % self.capacity if self.count > self.capacity else 0])
+
+    @property
+    def newest(self):
+        return int(self.times[(self.count - 1) % self.capacity]) if self.count else None
+
+    def append(self, timestamp, values):
+        slot_time = int(timestamp) // self.resolution * self.resolution
+        row = [np.nan if values.get(metric) is None else values[metric] for metric in self.metrics]
+        with self._lock:
+            last = (self.count - 1) % self.capacity
+            if self.count and slot_time < self.times[last]: return
+            # several snapshots within one slot: the newest wins
+            if self.count and slot_time == self.times[last]: i = last
+            else:
+                i = self.count % self.capacity
+                self.count += 1
+            self.times[i] = slot_time
+            self.values[:, i] = row
+
+    def window(self, start):
+        """(czasy, wartości) od start w kolejności czasu; kopia, więc można liczyć bez blokady"""
+        with self._lock:
+            if self.count <= self.capacity: times, values = self.times[:self.count], self.values[:, :self.count]
+            else:
+                head = self.count % self.capacity
+                times = np.concatenate((self.times[head:], self.times[:head]))
+                values = np.concatenate((self.values[:, head:], self.values[:, :head]), axis=1)
+            first = np.searchsorted(times, start)
+            return times[first:].copy(), values[:, first:].copy()
+
+    def aggregate(self, start, step):
+        """(numery kubełków, średnie, minima, maksima) dla kubełków po step s liczonych od start"""
+        times, values = self.window(start)
+        if not len(times): return np.empty(0, dtype=np.int64), *(np.empty((len(self.metrics), 0)),) * 3
+        buckets = (times - start) // step
+        bounds = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        present = ~np.isnan(values)
+        counts = np.add.reduceat(present, bounds, axis=1)
+        sums = np.add.reduceat(np.where(present, values, 0), bounds, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'): means = sums / counts
+        return buckets[bounds], means, np.fmin.reduceat(values, bounds, axis=1), np.fmax.reduceat(values, bounds, axis=1)
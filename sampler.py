@@ -0,0 +1,171 @@
+# sampler.py
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+Snapshot = namedtuple('Snapshot', ['seq', 'data', 'json', 'collected_at', 'delta_json'])
+
+
+def diff(old, new):
+    """Pola z new, które różnią się od old (zagnieżdżone słowniki rekurencyjnie)"""
+    changed = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff(previous, value)
+            if nested: changed[key] = nested
+        elif value != previous or key not in old:
+            changed[key] = value
+    return changed
+
+
+class Probe:
+    __slots__ = ('name', 'fn', 'interval', 'timeout', 'next_run', 'running',
+                 'runs', 'errors', 'overruns', 'last_ms', 'total_ms', 'max_ms')
+
+    def __init__(self, name, fn, interval, timeout):
+        self.name, self.fn, self.interval, self.timeout = name, fn, interval, timeout or interval
+        self.next_run, self.running = 0.0, False
+        self.runs = self.errors = self.overruns = 0
+        self.last_ms = self.total_ms = self.max_ms = 0.0
+
+    def stats(self):
+        return {
+            'interval_s': self.interval, 'timeout_s': self.timeout, 'runs': self.runs, 'errors': self.errors,
+            'overruns': self.overruns, 'running': self.running, 'last_ms': round(self.last_ms, 2),
+            'avg_ms': round(self.total_ms / self.runs, 2) if self.runs else 0.0, 'max_ms': round(self.max_ms, 2)}
+
+
+def merge(target, fragment):
+    for key, value in fragment.items():
+        previous = target.get(key)
+        target[key] = {**previous, **value} if isinstance(value, dict) and isinstance(previous, dict) else value
+
+
+class MetricsSampler:
+    """Uruchamia zarejestrowane sondy, każdą we własnym rytmie, i publikuje niezmienny snapshot"""
+
+    def __init__(self, workers=4, history=30, on_timing=None, on_publish=None):
+        self.workers = workers
+        self.on_timing, self.on_publish = on_timing, on_publish
+        self.probes = {}
+        self.values = {}
+        self.snapshot = None
+        self.history = deque(maxlen=history)
+        self.started_at = time.monotonic()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._dirty = False
+        self._executor = None
+        self._thread = None
+
+    def register(self, name, fn, interval, timeout=None):
+        """fn() zwraca fragment snapshotu (dict) albo None dla zadań bez danych, np. zapisu do bazy"""
+        self.probes[name] = Probe(name, fn, interval, timeout)
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='collector')
+        self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        with self._cond: self._cond.notify_all()
+        if self._executor: self._executor.shutdown(wait=False)
+
+    def _run(self):
+        # first round runs everything so the first snapshot is complete
+        now = time.monotonic()
+        pending = [self._submit(probe, now) for probe in self.probes.values()]
+        wait(pending, timeout=max((p.timeout for p in self.probes.values()), default=0))
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for probe in self.probes.values():
+                if not probe.running and now >= probe.next_run: self._submit(probe, now)
+            if self._dirty:
+                self._dirty = False
+                self.publish(self.assemble())
+            idle = [p.next_run for p in self.probes.values() if not p.running]
+            self._wake.wait(max(0.01, min(idle, default=now + 1) - time.monotonic()))
+            self._wake.clear()
+
+    def _submit(self, probe, now):
+        probe.running = True
+        # fixed rate: the next run is due one interval after this one started, however long it takes
+        probe.next_run = now + probe.interval
+        return self._executor.submit(self._call, probe)
+
+    def _call(self, probe):
+        started = time.monotonic()
+        try:
+            fragment = probe.fn()
+            if fragment is not None:
+                self.values[probe.name] = fragment
+                self._dirty = True
+        except Exception as e:
+            probe.errors += 1
+            print(f"Error in collector {probe.name}: {e}")
+        finally:
+            elapsed = (time.monotonic() - started) * 1000
+            probe.runs += 1
+            probe.last_ms, probe.total_ms, probe.max_ms = elapsed, probe.total_ms + elapsed, max(probe.max_ms, elapsed)
+            if elapsed > probe.timeout * 1000: probe.overruns += 1
+            if self.on_timing: self.on_timing(probe.name, elapsed / 1000)
+            probe.running = False
+            self._wake.set()
+
+    def assemble(self):
+        data = {}
+        for name in self.probes:
+            fragment = self.values.get(name)
+            if fragment: merge(data, fragment)
+        data['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return data
+
+    def collector_stats(self):
+        """Czas wykonania każdej sondy i łączny narzut zbierania"""
+        probes = {name: probe.stats() for name, probe in self.probes.items()}
+        busy_ms = sum(probe.total_ms for probe in self.probes.values())
+        return {'collectors': probes, 'busy_percent': round(busy_ms / 10 / max(time.monotonic() - self.started_at, 1e-3), 3)}
+
+    def publish(self, data, seq=None, encoded=None):
+        """seq i encoded podaje worker, który tylko odtwarza snapshoty procesu zbierającego"""
+        with self._cond:
+            previous = self.snapshot
+            # start from wall-clock ms so ids stay unique across restarts (SSE Last-Event-ID)
+            seq = seq or (previous.seq + 1 if previous else int(time.time() * 1000))
+            delta_json = json.dumps(diff(previous.data, data)) if previous else None
+            # snapshot is replaced, never mutated, so readers need no lock
+            self.snapshot = Snapshot(seq, data, encoded or json.dumps(data), time.time(), delta_json)
+            self.history.append(self.snapshot)
+            self._cond.notify_all()
+        if self.on_publish: self.on_publish(self.snapshot)
+
+    def latest(self, timeout=None):
+        """Ostatni snapshot; czeka na pierwszy pomiar najwyżej timeout sekund"""
+        snapshot = self.snapshot
+        if snapshot is None and timeout:
+            with self._cond:
+                self._cond.wait_for(lambda: self.snapshot is not None or self._stop.is_set(), timeout)
+            snapshot = self.snapshot
+        return snapshot
+
+    def find(self, seq):
+        """Snapshot o danym numerze, jeśli jest jeszcze w historii"""
+        with self._cond:
+            for snapshot in reversed(self.history):
+                if snapshot.seq == seq: return snapshot
+        return None
+
+    def wait_for_next(self, seq, timeout=None):
+        """Czekaj na snapshot nowszy niż seq"""
+        with self._cond:
+            self._cond.wait_for(lambda: (self.snapshot and self.snapshot.seq > seq) or self._stop.is_set(), timeout)
+            return self.snapshot
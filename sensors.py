@@ -0,0 +1,87 @@
+# sensors.py
+import glob
+import os
+import subprocess
+
+# bits of the Raspberry Pi firmware get_throttled value
+THROTTLED_FLAGS = {
+    0: 'under_voltage', 1: 'freq_capped', 2: 'throttled', 3: 'soft_temp_limit',
+    16: 'under_voltage_occurred', 17: 'freq_capped_occurred', 18: 'throttled_occurred', 19: 'soft_temp_limit_occurred'}
+
+
+class SensorReader:
+    """Temperatury, taktowanie i throttling prosto z sysfs, bez forka vcgencmd"""
+
+    def __init__(self, sys_root='/sys', vcgencmd_fallback=True):
+        self.sys_root = sys_root
+        self.vcgencmd_fallback = vcgencmd_fallback
+        self.zones = {}     # zone type -> fd of .../temp
+        self.cpus = {}      # cpu name -> fd of .../scaling_cur_freq
+        self.throttled_fd = None
+        self.discover()
+
+    def _open(self, path):
+        try: return os.open(path, os.O_RDONLY)
+        except OSError: return None
+
+    def discover(self):
+        self.close()
+        for zone in sorted(glob.glob(os.path.join(self.sys_root, 'class/thermal/thermal_zone*'))):
+            fd = self._open(os.path.join(zone, 'temp'))
+            if fd is None: continue
+            name = self._read_file(os.path.join(zone, 'type')) or os.path.basename(zone)
+            self.zones[name if name not in self.zones else os.path.basename(zone)] = fd
+        for cpu in sorted(glob.glob(os.path.join(self.sys_root, 'devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq'))):
+            fd = self._open(cpu)
+            if fd is not None: self.cpus[cpu.split(os.sep)[-3]] = fd
+        self.throttled_fd = self._open(os.path.join(self.sys_root, 'devices/platform/soc/soc:firmware/get_throttled'))
+
+    def close(self):
+        for fd in [*self.zones.values(), *self.cpus.values(), self.throttled_fd]:
+            if fd is not None: os.close(fd)
+        self.zones, self.cpus, self.throttled_fd = {}, {}, None
+
+    def _read_file(self, path):
+        try:
+            with open(path) as f: return f.read().strip()
+        except OSError: return None
+
+    def _read(self, fd):
+        # sysfs regenerates the attribute on every read at offset 0, so the fd can stay open
+        return os.pread(fd, 64, 0).decode().strip()
+
+    def read_zones(self):
+        temps = {}
+        for name, fd in self.zones.items():
+            try: temps[name] = round(int(self._read(fd)) / 1000, 1)
+            except (OSError, ValueError): continue
+        return temps
+
+    def read_cpu_freq(self):
+        freqs = {}
+        for name, fd in self.cpus.items():
+            try: freqs[name] = round(int(self._read(fd)) / 1000)
+            except (OSError, ValueError): continue
+        return freqs
+
+    def read_throttled(self):
+        if self.throttled_fd is None: return None
+        try: return int(self._read(self.throttled_fd), 16)
+        except (OSError, ValueError): return None
+
+    def vcgencmd_temperature(self):
+        try: return float(subprocess.check_output(['vcgencmd', 'measure_temp'], timeout=2).decode('utf-8').split('=')[1].split('\'')[0])
+        except Exception: return None
+
+    def read(self):
+        """Fragment snapshotu: temperature oraz szczegóły w sensors"""
+        zones = self.read_zones()
+        freqs = self.read_cpu_freq()
+        throttled = self.read_throttled()
+        temperature = zones.get('cpu-thermal', next(iter(zones.values()), None))
+        if temperature is None and self.vcgencmd_fallback: temperature = self.vcgencmd_temperature()
+        sensors = {
+            'zones': zones, 'cpu_freq': freqs,
+            'cpu_freq_mhz': round(sum(freqs.values()) / len(freqs)) if freqs else None, 'throttled': throttled}
+        if throttled is not None: sensors['throttled_flags'] = {flag: bool(throttled >> bit & 1) for bit, flag in THROTTLED_FLAGS.items()}
+        return {'temperature': temperature if temperature is not None else 0.0, 'sensors': sensors}
@@ -0,0 +1,178 @@
+# shared.py
+import fcntl
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class LeaderLock:
+    """Blokada flock na pliku: trzyma ją dokładnie jeden proces, zwalnia się sama, gdy proces zginie"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    @property
+    def held(self):
+        return self.fd is not None
+
+    def acquire(self):
+        if self.fd is not None: return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f'{os.getpid()}\n'.encode())
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is None: return
+        fd, self.fd = self.fd, None
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class SharedSlot:
+    """Jedna wartość bajtowa w pliku mmap, pisana przez jeden proces (seqlock), czytana przez wiele"""
+    # version (odd while writing), value seq, value length, last reader heartbeat (wall clock)
+    HEADER = struct.Struct('<QQQd')
+
+    def __init__(self, path, size):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size: os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.capacity = size - self.HEADER.size
+
+    def _header(self):
+        return self.HEADER.unpack_from(self.map, 0)
+
+    def write(self, seq, data):
+        if len(data) > self.capacity: return False
+        version = self._header()[0]
+        version += 1 if version % 2 == 0 else 0
+        struct.pack_into('<Q', self.map, 0, version)
+        self.map[self.HEADER.size:self.HEADER.size + len(data)] = data
+        struct.pack_into('<QQ', self.map, 8, seq, len(data))
+        struct.pack_into('<Q', self.map, 0, version + 1)
+        return True
+
+    def read(self, last_seq=None, retries=10):
+        """(seq, dane) albo (seq, None), gdy nic nowego od last_seq lub zapis wciąż trwa"""
+        for _ in range(retries):
+            version, seq, length, _ = self._header()
+            if version % 2: continue
+            if seq == last_seq or not version: return seq, None
+            data = self.map[self.HEADER.size:self.HEADER.size + length]
+            if self._header()[0] == version: return seq, data
+        return last_seq, None
+
+    def touch(self):
+        # readers announce they still want the value; the field sits outside the seqlocked part
+        struct.pack_into('<d', self.map, 24, time.time())
+
+    def touched_within(self, seconds):
+        return time.time() - self._header()[3] < seconds
+
+
+class RemoteStream:
+    """Udaje proces kamery: stdout oddaje klatki, które proces-właściciel wystawia w SharedSlot"""
+
+    def __init__(self, slot, stall_timeout=5, poll=0.01):
+        self.slot, self.stall_timeout, self.poll = slot, stall_timeout, poll
+        self.stdout = self
+        self.returncode = None
+        self._seq = slot.read()[0]
+        self._pending = memoryview(b'')
+        self._touched = 0.0
+
+    def readinto1(self, buffer):
+        deadline = time.monotonic() + self.stall_timeout
+        while not self._pending:
+            if self.returncode is not None or time.monotonic() > deadline: return 0
+            if time.monotonic() - self._touched > 1:
+                self.slot.touch()
+                self._touched = time.monotonic()
+            seq, data = self.slot.read(self._seq)
+            if data is None:
+                time.sleep(self.poll)
+                continue
+            self._seq, self._pending = seq, memoryview(data)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def terminate(self):
+        self.returncode = -15
+
+    kill = terminate
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+class CommandSpool:
+    """Polecenia dla jednego procesu-wykonawcy jako pliki w katalogu; każde wykonuje się najwyżej raz"""
+
+    def __init__(self, directory, poll=0.05):
+        self.directory, self.poll = directory, poll
+        os.makedirs(directory, exist_ok=True)
+
+    def _write(self, path, value):
+        with open(path + '.tmp', 'w') as f: json.dump(value, f)
+        os.replace(path + '.tmp', path)
+
+    def submit(self, command, timeout=5):
+        """Wynik handlera dla command albo None, gdy nikt go nie wykonał w czasie timeout"""
+        path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex}')
+        self._write(path + '.cmd', command)
+        deadline, claimed = time.monotonic() + timeout, False
+        while True:
+            try:
+                with open(path + '.result') as f: result = json.load(f)
+                os.remove(path + '.result')
+                return result
+            except FileNotFoundError: pass
+            if time.monotonic() > deadline:
+                if claimed: return None
+                # withdraw the command, unless the executor has already claimed it: then give it one more timeout
+                try:
+                    os.remove(path + '.cmd')
+                    return None
+                except FileNotFoundError: deadline, claimed = time.monotonic() + timeout, True
+            time.sleep(self.poll)
+
+    def serve(self, handler, active=lambda: True):
+        """Wykonuje polecenia w wątku w tle, gdy active(); rename na .run sprawia, że polecenie bierze dokładnie jeden proces"""
+        def run():
+            while True:
+                for name in sorted(os.listdir(self.directory)) if active() else ():
+                    if not name.endswith('.cmd'): continue
+                    path = os.path.join(self.directory, name[:-4])
+                    try: os.rename(path + '.cmd', path + '.run')
+                    except FileNotFoundError: continue
+                    try:
+                        with open(path + '.run') as f: result = handler(json.load(f))
+                    except Exception as e:
+                        print(f"Error running command {name}: {e}")
+                        result = None
+                    self._write(path + '.result', result)
+                    os.remove(path + '.run')
+                time.sleep(self.poll)
+        threading.Thread(target=run, name='command-spool', daemon=True).start()
+        return self